@@ -1,9 +1,19 @@
-from django.contrib import admin
-from .models import Genre, Author, Book, BookInstance, BookReview, Profile
+from django.contrib import admin, messages
+from django.db.models import Prefetch
+from django.http import HttpResponseRedirect
+from .forms import InstanceAdminForm
+from .models import Genre, Author, Book, BookInstance, BookReview, Profile, LoanReminder, Loan, Hold
+from . import loans
 
 
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ['first_name', 'last_name', 'display_books']
+    search_fields = ['first_name', 'last_name']
+
+    def get_queryset(self, request):
+        # display_books naudoja iš anksto užkrautus pavadinimus, o ne užklausą kiekvienai eilutei
+        books = Book.objects.only('title', 'author_id')
+        return super().get_queryset(request).prefetch_related(Prefetch('books', queryset=books))
 
 
 class BookInstanceInLine(admin.TabularInline):
@@ -17,24 +27,91 @@ class BookInstanceInLine(admin.TabularInline):
 class BookReviewInLine(admin.TabularInline):
     model = BookReview
     extra = 0
+    autocomplete_fields = ['reviewer']
 
 class BookAdmin(admin.ModelAdmin):
     list_display = ['title', 'isbn', 'author', 'display_genre']
+    list_select_related = ['author']
+    search_fields = ['title', '=isbn']
+    autocomplete_fields = ['author']
     inlines = [BookReviewInLine, BookInstanceInLine]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('genre')
+
 
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ['uuid', 'book', 'due_back', 'reader', 'status']
-    list_filter = ['status', 'due_back', 'book', 'reader']
-    search_fields = ['uuid', 'book__title']
-    list_editable = ['due_back', 'reader', 'status']
+    list_select_related = ['book', 'reader']
+    # knygos ir skaitytojo filtrai išskleistų visas lenteles, todėl jie pakeisti paieška ir autocomplete;
+    # skaitytojas keičiamas egzemplioriaus formoje, nes sąraše kiekviena eilutė jį užkrautų atskirai
+    list_filter = ['status', 'due_back']
+    search_fields = ['=uuid', '^book__title', '^reader__username']
+    autocomplete_fields = ['book', 'reader']
+    list_editable = ['due_back', 'status']
+    form = InstanceAdminForm
+    show_full_result_count = False
     fieldsets = [
         ("General", {"fields": ('uuid', 'book')}),
         ("Availability", {"fields": ('status', 'due_back', 'reader')}),
     ]
 
+    def get_changelist_form(self, request, **kwargs):
+        return super().get_changelist_form(request, form=InstanceAdminForm, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        # ir formoje, ir sąraše (list_editable) keičiama sąlyginiu UPDATE per library/loans.py,
+        # tikintis būsenos, kurią matė redaguotojas (expected_status)
+        if not change:
+            return super().save_model(request, obj, form, change)
+        if form.changed_data:
+            changes = {field: form.cleaned_data[field] for field in form.changed_data if field != "expected_status"}
+            try:
+                loans.update(obj, form.cleaned_data["expected_status"] or form.initial["status"],
+                             old_book_id=form.initial.get("book"), **changes)
+            except loans.LoanError as error:
+                request.loan_errors = True
+                self.message_user(request, f"{obj}: {error}", level=messages.ERROR)
+
+    def message_user(self, request, message, level=messages.INFO, *args, **kwargs):
+        # po LoanError Django pranešimas apie sėkmingą pakeitimą būtų klaidingas
+        if level == messages.SUCCESS and getattr(request, "loan_errors", False):
+            return
+        super().message_user(request, message, level, *args, **kwargs)
+
+    def response_change(self, request, obj):
+        if getattr(request, "loan_errors", False):
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
+
+class LoanReminderAdmin(admin.ModelAdmin):
+    list_display = ['instance', 'reader', 'kind', 'due_back', 'date_sent']
+    list_filter = ['kind', 'date_sent']
+    list_select_related = ['instance', 'reader']
+
+
+class LoanAdmin(admin.ModelAdmin):
+    list_display = ['instance', 'reader', 'date_out', 'due_back', 'date_returned']
+    list_filter = ['date_out', 'date_returned']
+    list_select_related = ['instance', 'reader']
+    search_fields = ['=instance__uuid', '^reader__username']
+    readonly_fields = ['instance', 'reader', 'date_out', 'due_back', 'date_returned']
+
+
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ['book', 'reader', 'status', 'date_placed', 'expires_at', 'instance']
+    list_filter = ['status', 'date_placed']
+    list_select_related = ['book', 'reader', 'instance']
+    search_fields = ['^book__title', '^reader__username']
+    readonly_fields = ['book', 'reader', 'instance', 'status', 'date_placed']
+
+
 admin.site.register(Genre)
 admin.site.register(Author, AuthorAdmin)
 admin.site.register(Book, BookAdmin)
 admin.site.register(BookInstance, BookInstanceAdmin)
-admin.site.register(Profile)
\ No newline at end of file
+admin.site.register(Profile)
+admin.site.register(LoanReminder, LoanReminderAdmin)
+admin.site.register(Loan, LoanAdmin)
+admin.site.register(Hold, HoldAdmin)
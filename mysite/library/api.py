@@ -0,0 +1,151 @@
+import hashlib
+import json
+import zlib
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from .models import Author, Book, Genre
+from .pagination import CursorPaginator
+from . import versions
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tik skaitymui skirtas JSON API kioskams ir mobiliosioms programėlėms.
+# Duomenys imami per .values() (modeliai nekuriami), sąrašai puslapiuojami
+# pagal raktą. ETag ir Last-Modified skaičiuojami iš lentelių versijų keše,
+# todėl atsakymas 304 neužklausia duomenų bazės.
+
+BOOK_FIELDS = ("id", "title", "isbn", "cover", "author_id", "author__first_name", "author__last_name",
+               "copies_total", "copies_available", "copies_taken", "copies_reserved", "next_due_back")
+AUTHOR_FIELDS = ("id", "first_name", "last_name")
+GENRE_FIELDS = ("id", "name")
+CHUNK_SIZE = 100
+
+
+def dumps(value):
+    if orjson:
+        return orjson.dumps(value)
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+
+
+def choose_encoding(request):
+    accepted = request.headers.get("Accept-Encoding", "")
+    if brotli and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(chunks, encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        yield from (compressor.process(chunk) for chunk in chunks)
+        yield compressor.finish()
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        yield from (compressor.compress(chunk) for chunk in chunks)
+        yield compressor.flush()
+    else:
+        yield from chunks
+
+
+def versioned(*tables):
+    # ETag priklauso nuo adreso, lentelių versijų ir suspaudimo; atitikus - 304 be užklausų
+    def decorator(view):
+        def wrapper(request, *args, **kwargs):
+            encoding = choose_encoding(request)
+            stamps = versions.get_versions(*tables)
+            digest = hashlib.md5(f"{request.get_full_path()}|{stamps}".encode()).hexdigest()
+            etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            last_modified = int(max(stamps))
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                chunks = view(request, *args, **kwargs)
+                response = StreamingHttpResponse(compress(chunks, encoding), content_type="application/json")
+                if encoding:
+                    response["Content-Encoding"] = encoding
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            response["Cache-Control"] = "public, max-age=0, must-revalidate"
+            patch_vary_headers(response, ["Accept-Encoding"])
+            return response
+        return require_GET(wrapper)
+    return decorator
+
+
+def stream_list(rows, **extra):
+    # {"results": [...], ...} rašomas dalimis, visas sąrašas neserializuojamas vienu kartu
+    yield b'{"results":['
+    chunk, separator = [], b""
+    for row in rows:
+        chunk.append(dumps(row))
+        if len(chunk) == CHUNK_SIZE:
+            yield separator + b",".join(chunk)
+            chunk, separator = [], b","
+    if chunk:
+        yield separator + b",".join(chunk)
+    yield b"]" + b"".join(b',"%s":%s' % (key.encode(), dumps(value)) for key, value in extra.items()) + b"}"
+
+
+def paginated(request, queryset, ordering, transform=None):
+    try:
+        limit = min(max(int(request.GET.get("limit", settings.LIBRARY_API_PAGE_SIZE)), 1), 500)
+    except ValueError:
+        limit = settings.LIBRARY_API_PAGE_SIZE
+    page = CursorPaginator(queryset, limit, ordering).page(request.GET.get("cursor"))
+    rows = map(transform, page.object_list) if transform else page.object_list
+    return stream_list(rows, next=page.next_token, previous=page.previous_token)
+
+
+def book_row(row):
+    if row["cover"]:
+        row["cover"] = settings.MEDIA_URL + row["cover"]
+    return row
+
+
+@versioned("book", "author", "instance")
+def books(request):
+    queryset = Book.objects.with_availability()
+    if request.GET.get("available"):
+        queryset = queryset.available()
+    return paginated(request, queryset.values(*BOOK_FIELDS), ("title", "id"), book_row)
+
+
+@versioned("book", "author", "genre", "instance")
+def book(request, pk):
+    row = Book.objects.with_availability().values(*BOOK_FIELDS, "summary").filter(pk=pk).first()
+    if row is None:
+        raise Http404
+    row["genres"] = list(Genre.objects.filter(book=pk).values(*GENRE_FIELDS))
+    return [dumps(book_row(row))]
+
+
+@versioned("author")
+def authors(request):
+    return paginated(request, Author.objects.values(*AUTHOR_FIELDS), ("id",))
+
+
+@versioned("author", "book")
+def author(request, pk):
+    row = Author.objects.values(*AUTHOR_FIELDS, "description").filter(pk=pk).first()
+    if row is None:
+        raise Http404
+    row["books"] = list(Book.objects.filter(author=pk).order_by("title", "id").values("id", "title"))
+    return [dumps(row)]
+
+
+@versioned("genre")
+def genres(request):
+    return stream_list(Genre.objects.order_by("name").values(*GENRE_FIELDS).iterator(chunk_size=CHUNK_SIZE))
@@ -6,4 +6,4 @@ class LibraryConfig(AppConfig):
     name = 'library'
 
     def ready(self):
-        from .signals import create_profile, save_profile
\ No newline at end of file
+        from .signals import create_profile
\ No newline at end of file
@@ -0,0 +1,94 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import render
+from .models import Author, Book, BookRecommendation, BookReview
+from .pagination import CursorPaginator, apaginate
+from . import counters, search as search_index, views
+from .forms import BookReviewForm
+
+# Async (ASGI) katalogo rodiniai, įjungiami LIBRARY_ASYNC_VIEWS = True. Visi duomenys
+# užkraunami rodinyje per async ORM (šablonas negali vykdyti užklausų async kontekste),
+# nepriklausomos užklausos vykdomos kartu per asyncio.gather. Rašymas (POST)
+# perduodamas sinchroniniams rodiniams. Šablonai su {% cachedfragment %} atvaizduojami
+# per sync_to_async: DatabaseCache (LIBRARY_CACHE_URL=db) kešą skaito užklausomis.
+
+
+async def index(request):
+    request.user = await request.auser()
+    num_visits = views.visits(request)
+    response = render(request, template_name="index.html", context={
+        **await counters.aget_counters(),
+        'num_visits': num_visits,
+    })
+    views.set_visits(response, num_visits)
+    return response
+
+
+async def authors(request):
+    request.user = await request.auser()
+    context = {
+        "authors": await apaginate(request, Author.objects.all(), per_page=3),
+    }
+    return render(request, template_name="authors.html", context=context)
+
+
+async def books(request):
+    request.user = await request.auser()
+    view = views.BookListView(request=request, kwargs={})
+    queryset = view.get_queryset()
+    ordering = view.get_ordering()
+    if settings.LIBRARY_CURSOR_PAGINATION:
+        paginator = CursorPaginator(queryset, view.paginate_by, ordering,
+                                    approximate_count=settings.LIBRARY_CURSOR_APPROXIMATE_COUNT)
+        page = await paginator.apage(request.GET.get("cursor"))
+    else:
+        page = await apaginate(request, queryset, view.paginate_by, ordering)
+    context = {
+        "books": page.object_list,
+        "page_obj": page,
+        "paginator": page.paginator,
+        "is_paginated": page.has_other_pages(),
+    }
+    return await sync_to_async(render)(request, template_name="books.html", context=context)
+
+
+async def book(request, pk):
+    if request.method != "GET":
+        return await sync_to_async(views.BookDetailView.as_view())(request, pk=pk)
+    request.user = await request.auser()
+    try:
+        # egzemplioriai ir atsiliepimai užkraunami iš karto, nes fragmentai jų užklausti nebegali
+        book = await Book.objects.for_detail().prefetch_related("instances").aget(pk=pk)
+    except Book.DoesNotExist:
+        raise Http404
+    reviews = CursorPaginator(BookReview.objects.for_book(book.pk), settings.LIBRARY_REVIEWS_PAGE_SIZE, ("-pk",))
+    context = {"book": book, "object": book, "form": BookReviewForm(), "reviews": await reviews.apage(),
+               "recommendations": [row async for row in BookRecommendation.objects.for_book(book.pk)]}
+    return await sync_to_async(render)(request, template_name="book.html", context=context)
+
+
+def search_page(results, number):
+    page = Paginator(results, per_page=10).get_page(number)
+    page.object_list = list(page.object_list)
+    return page
+
+
+async def search(request):
+    request.user = await request.auser()
+    query = request.GET.get('query', '')
+    # paieškos indeksas naudoja tiesioginį kursorių, todėl abi pusės vykdomos per sync_to_async
+    books, authors = await asyncio.gather(
+        sync_to_async(search_page)(search_index.search_books(Book.objects.with_availability(), query),
+                                   request.GET.get('books_page')),
+        sync_to_async(search_page)(search_index.search_authors(Author.objects.all(), query),
+                                   request.GET.get('authors_page')),
+    )
+    context = {
+        "query": query,
+        "books": books,
+        "authors": authors,
+    }
+    return render(request, template_name="search.html", context=context)
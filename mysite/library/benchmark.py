@@ -0,0 +1,288 @@
+import asyncio
+import io
+import math
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import islice
+from wsgiref.util import setup_testing_defaults
+from PIL import Image
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.db import connection
+from django.test.testcases import QuietWSGIRequestHandler
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Author, Book, BookInstance, BookReview, Genre, Profile
+from . import counters, loans
+
+# Našumo matavimas: sintetinis katalogas ir kiekvieno library.urls maršruto
+# vėlinimas, pralaidumas ir užklausų skaičius. Naudoja benchmark komanda.
+
+BATCH_SIZE = 5000
+PASSWORD = "slaptazodis"
+WORDS = ("saulė", "upė", "miškas", "vakaras", "žemė", "vėjas", "laiškas", "kelias", "namai", "sodas",
+         "šešėlis", "ruduo", "žiema", "pavasaris", "vasara", "dangus", "marti", "altorius", "malūnas", "šilelis")
+
+
+@contextmanager
+def test_database():
+    # atskira (SQLite - failinė, kad kitos gijos ir procesai turėtų savo jungtis) duomenų bazė matavimams
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    if connection.vendor == "sqlite" and not test_settings.get("NAME"):
+        test_settings["NAME"] = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection.settings_dict["NAME"]
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def batched(objects, model):
+    objects = iter(objects)
+    while batch := list(islice(objects, BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+
+
+def title(rng, i):
+    return " ".join(rng.choice(WORDS) for _ in range(3)).capitalize() + f" {i}"
+
+
+def seed(scale, seed=1):
+    # scale - knygų skaičius; kiti kiekiai proporcingi jam
+    rng = random.Random(seed)
+    n_authors, n_users = max(scale // 10, 1), max(scale // 10, 2)
+    password = make_password(PASSWORD)
+    batched((User(username=f"skaitytojas{i}", password=password) for i in range(n_users)), User)
+    users = list(User.objects.order_by("pk").values_list("pk", flat=True))
+    batched((Profile(user_id=pk) for pk in users), Profile)
+    User.objects.filter(pk=users[0]).update(is_staff=True, is_superuser=True)
+
+    Genre.objects.bulk_create([Genre(name=word.capitalize()) for word in WORDS])
+    genres = list(Genre.objects.values_list("pk", flat=True))
+    batched((Author(first_name=rng.choice(WORDS).capitalize(), last_name=f"Autorius{i}",
+                    description="") for i in range(n_authors)), Author)
+    authors = list(Author.objects.values_list("pk", flat=True))
+    batched((Book(title=title(rng, i), summary=" ".join(rng.choices(WORDS, k=30)), isbn=f"{i:013d}",
+                  author_id=rng.choice(authors)) for i in range(scale)), Book)
+
+    today = date.today()
+    through = Book.genre.through
+    pks = list(Book.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(pks), BATCH_SIZE):
+        books = pks[start:start + BATCH_SIZE]
+        through.objects.bulk_create([through(book_id=pk, genre_id=rng.choice(genres)) for pk in books],
+                                    ignore_conflicts=True)
+        instances = []
+        for pk in books:
+            for _ in range(rng.randint(1, 5)):
+                status = rng.choice("aaatr")
+                reader = rng.choice(users) if status != 'a' else None
+                due_back = today + timedelta(days=rng.randint(-10, 30)) if status == 't' else None
+                instances.append(BookInstance(book_id=pk, status=status, reader_id=reader, due_back=due_back))
+        BookInstance.objects.bulk_create(instances)
+        BookReview.objects.bulk_create([BookReview(book_id=pk, reviewer_id=rng.choice(users), content="Gera knyga")
+                                        for pk in books])
+    Book.objects.refresh_review_stats()
+    call_command("rebuild_search_index", batch_size=BATCH_SIZE, stdout=io.StringIO())
+    counters.reconcile()
+    return User.objects.get(pk=users[0])
+
+
+def image_upload():
+    file = io.BytesIO()
+    Image.new("RGB", (600, 400), "teal").save(file, "JPEG")
+    return SimpleUploadedFile("nuotrauka.jpg", file.getvalue(), content_type="image/jpeg")
+
+
+def scenarios(user):
+    # (pavadinimas, metodas, adresas, duomenų funkcija); POST scenarijai kuria naujus įrašus
+    book = Book.objects.order_by("pk").first()
+    instance = BookInstance.objects.filter(status='a').order_by("pk").first()
+    # eilė kitai knygai, kad rezervacija nepaliestų redaguojamo egzemplioriaus
+    hold = loans.place_hold(Book.objects.exclude(pk=instance.book_id).order_by("-pk").first(), user)
+    routes = [
+        ("index", "get", reverse("index"), None),
+        ("authors", "get", reverse("authors"), None),
+        ("author", "get", reverse("author", kwargs={"author_id": book.author_id}), None),
+        ("books", "get", reverse("books"), None),
+        ("books_available", "get", reverse("books") + "?available=1&sort=available", None),
+        ("book", "get", reverse("book", kwargs={"pk": book.pk}), None),
+        ("book_reviews", "get", reverse("book_reviews", kwargs={"pk": book.pk}), None),
+        ("search", "get", reverse("search") + "?query=saule", None),
+        ("mybooks", "get", reverse("mybooks"), None),
+        ("profile", "get", reverse("profile"), None),
+        ("instances", "get", reverse("instances"), None),
+        ("instances_filtered", "get", reverse("instances") + "?status=t", None),
+        ("instance", "get", reverse("instance", kwargs={"pk": instance.pk}), None),
+        ("instances_new", "get", reverse("instances_new"), None),
+        ("instances_update", "get", reverse("instances_update", kwargs={"pk": instance.pk}), None),
+        ("instances_delete", "get", reverse("instances_delete", kwargs={"pk": instance.pk}), None),
+        ("signup", "get", reverse("signup"), None),
+        ("api_books", "get", reverse("api_books"), None),
+        ("api_book", "get", reverse("api_book", kwargs={"pk": book.pk}), None),
+        ("api_authors", "get", reverse("api_authors"), None),
+        ("api_author", "get", reverse("api_author", kwargs={"pk": book.author_id}), None),
+        ("api_genres", "get", reverse("api_genres"), None),
+        ("place_hold", "post", reverse("place_hold", kwargs={"pk": hold.book_id}), lambda: {}),
+        ("cancel_hold", "post", reverse("cancel_hold", kwargs={"pk": hold.pk}), lambda: {}),
+        ("instances_new_post", "post", reverse("instances_new"),
+         lambda: {"book": book.pk, "status": "a"}),
+        ("instances_update_post", "post", reverse("instances_update", kwargs={"pk": instance.pk}),
+         lambda: {"book": book.pk, "status": "a", "reader": "", "due_back": "", "expected_status": "a"}),
+        ("profile_upload", "post", reverse("profile"),
+         lambda: {"first_name": user.first_name, "last_name": "", "email": "", "photo": image_upload()}),
+    ]
+    return routes
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def measure(client, routes, requests=20):
+    results = {}
+    for name, method, url, data in routes:
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(url, data() if data else None)
+                if getattr(response, "streaming", False):
+                    b"".join(response.streaming_content)
+            latencies.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            "status": response.status_code,
+            "queries": len(queries),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "rps": round(requests / (sum(latencies) / 1000), 1),
+        }
+    return results
+
+
+def fetch(url, cookie):
+    started = time.perf_counter()
+    request = urllib.request.Request(url, headers={"Cookie": cookie})
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return status, (time.perf_counter() - started) * 1000
+
+
+def load_test(routes, cookie, requests=200, concurrency=8):
+    # tikras HTTP serveris (gija kiekvienai užklausai) ir concurrency lygiagrečių klientų; tik GET maršrutai
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    results = {}
+    try:
+        for name, method, url, data in routes:
+            if method != "get":
+                continue
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                responses = list(pool.map(lambda _: fetch(f"http://{host}:{port}{url}", cookie), range(requests)))
+            results[name] = summarize(responses, time.perf_counter() - started)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def summarize(responses, elapsed):
+    latencies = [latency for status, latency in responses]
+    return {
+        "errors": sum(status >= 400 for status, latency in responses),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "rps": round(len(responses) / elapsed, 1),
+    }
+
+
+def wsgi_load(url, cookie, requests, concurrency):
+    # WSGI: kaip gijomis dirbantis serveris, tik be tinklo
+    handler = WSGIHandler()
+    path, _, query = url.partition("?")
+
+    def call(_):
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "HTTP_COOKIE": cookie}
+        setup_testing_defaults(environ)
+        status = []
+        started = time.perf_counter()
+        response = handler(environ, lambda code, headers, exc_info=None: status.append(int(code.split()[0])))
+        b"".join(response)
+        response.close()
+        return status[0], (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        responses = list(pool.map(call, range(requests)))
+    return summarize(responses, time.perf_counter() - started)
+
+
+async def asgi_load(url, cookie, requests, concurrency):
+    # ASGI: concurrency vienu metu vykdomų užklausų viename įvykių cikle
+    handler = ASGIHandler()
+    path, _, query = url.partition("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+             "root_path": "", "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+             "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())]}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        messages, requested, done = [], [], asyncio.Event()
+
+        async def receive():
+            # pirmas pranešimas - tuščias užklausos kūnas, toliau laukiama atsijungimo
+            if not requested:
+                requested.append(True)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(dict(scope), receive, send)
+            done.set()
+            return messages[0]["status"], (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(call() for _ in range(requests)))
+    return summarize(responses, time.perf_counter() - started)
+
+
+def compare(results, baseline, threshold=1.25, noise_ms=1.0):
+    # regresija: daugiau užklausų arba p95 išaugo daugiau nei threshold kartų (ir daugiau nei noise_ms)
+    regressions = []
+    for section in ("routes", "server"):
+        for name, current in results.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            if current.get("queries", 0) > before.get("queries", 0):
+                regressions.append(f"{section}/{name}: {before['queries']} -> {current['queries']} queries")
+            if current["p95_ms"] > before["p95_ms"] * threshold and current["p95_ms"] - before["p95_ms"] > noise_ms:
+                regressions.append(f"{section}/{name}: p95 {before['p95_ms']} -> {current['p95_ms']} ms")
+    return regressions
@@ -0,0 +1,84 @@
+import threading
+from collections import Counter
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.translation import get_language
+
+# Šablonų fragmentų kešas. Raktas sudarytas iš fragmento versijos, pavadinimo,
+# kalbos ir objekto id, todėl išsaugojus objektą ištrinami tik su juo susiję raktai.
+# FRAGMENT_VERSION didinamas pakeitus fragmentų HTML.
+
+FRAGMENT_VERSION = 2
+PREFIX = f"library:fragment:v{FRAGMENT_VERSION}"
+STATS_PREFIX = "library:fragment-stats"
+# kiek fragmentų užklausų procesas sukaupia prieš įrašydamas statistiką į kešą
+STATS_FLUSH_EVERY = 100
+
+FRAGMENTS = ("book_card", "book_info", "book_reviews", "book_instances", "author_bio", "author_books")
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+
+
+def is_shared():
+    # LocMemCache ir DummyCache matomi tik savo procese: kitų workerių ir komandų pakeitimų jie nemato
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def fragment_key(name, *vary_on, language=None):
+    vary = ":".join(str(value) for value in vary_on)
+    return f"{PREFIX}:{name}:{language or get_language()}:{vary}"
+
+
+def get_fragment(name, *vary_on):
+    html = cache.get(fragment_key(name, *vary_on))
+    record(name, "hit" if html is not None else "miss")
+    return html
+
+
+def set_fragment(html, name, *vary_on):
+    cache.set(fragment_key(name, *vary_on), html, settings.LIBRARY_FRAGMENT_TIMEOUT)
+
+
+def invalidate(name, *pks):
+    # trinama po COMMIT, kad kita užklausa nespėtų iš naujo užkešuoti senų duomenų
+    keys = [fragment_key(name, pk, language=code) for pk in pks if pk is not None
+            for code, _ in settings.LANGUAGES]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def record(name, outcome):
+    # statistika renkama tik įjungus LIBRARY_FRAGMENT_STATS ir kaupiama procese: su DatabaseCache
+    # kiekvienas incr būtų rašymas į duomenų bazę skaitant bet kurį katalogo puslapį
+    if not settings.LIBRARY_FRAGMENT_STATS:
+        return
+    with _pending_lock:
+        _pending[f"{STATS_PREFIX}:{name}:{outcome}"] += 1
+        full = _pending.total() >= STATS_FLUSH_EVERY
+    if full:
+        flush_stats()
+
+
+def flush_stats():
+    # get + set: lygiagrečiai rašant keliems workeriams dalis skaičių gali pasimesti, statistikai to pakanka
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if pending:
+        values = cache.get_many(list(pending))
+        cache.set_many({key: values.get(key, 0) + count for key, count in pending.items()}, timeout=None)
+
+
+def stats():
+    keys = [f"{STATS_PREFIX}:{name}:{outcome}" for name in FRAGMENTS for outcome in ("hit", "miss")]
+    values = cache.get_many(keys)
+    return {name: {outcome: values.get(f"{STATS_PREFIX}:{name}:{outcome}", 0) for outcome in ("hit", "miss")}
+            for name in FRAGMENTS}
+
+
+def reset_stats():
+    cache.delete_many([f"{STATS_PREFIX}:{name}:{outcome}" for name in FRAGMENTS for outcome in ("hit", "miss")])
@@ -0,0 +1,131 @@
+import csv
+import json
+from django.db import transaction
+from django.db.models import Count
+from .models import Author, Book, BookInstance, Genre
+from . import caching, search, versions
+
+# Katalogo importas ir eksportas. Vienas įrašas - viena knyga:
+# isbn, title, summary, author_first_name, author_last_name, genres, copies.
+# CSV faile žanrai atskiriami kabliataškiu, JSONL faile tai sąrašas.
+
+FIELDS = ("isbn", "title", "summary", "author_first_name", "author_last_name", "genres", "copies")
+GENRE_SEPARATOR = ";"
+# natūralių raktų žodynai išvalomi juos užpildžius, kad atmintis neaugtų be ribų
+KEY_CACHE_SIZE = 100_000
+
+
+def read_rows(file, fmt):
+    if fmt == "csv":
+        for row in csv.DictReader(file):
+            row["genres"] = [name.strip() for name in row.get("genres", "").split(GENRE_SEPARATOR) if name.strip()]
+            yield row
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_rows(file, fmt, rows):
+    if fmt == "csv":
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "genres": GENRE_SEPARATOR.join(row["genres"])})
+    else:
+        for row in rows:
+            file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def export_rows(chunk_size=2000):
+    books = (Book.objects.select_related("author").prefetch_related("genre")
+             .annotate(copies=Count("instances")).order_by("pk"))
+    for book in books.iterator(chunk_size=chunk_size):
+        yield {
+            "isbn": book.isbn,
+            "title": book.title,
+            "summary": book.summary,
+            "author_first_name": book.author.first_name if book.author else "",
+            "author_last_name": book.author.last_name if book.author else "",
+            "genres": [genre.name for genre in book.genre.all()],
+            "copies": book.copies,
+        }
+
+
+class Importer:
+    def __init__(self):
+        self.authors = {}
+        self.genres = {}
+        self.created = self.updated = self.copies = 0
+
+    def author_ids(self, rows):
+        keys = {(row["author_first_name"], row["author_last_name"]) for row in rows if row.get("author_last_name")}
+        # išvaloma prieš skaičiuojant trūkstamus, kad šio paketo raktai būtų užklausti iš naujo
+        if len(self.authors) > KEY_CACHE_SIZE:
+            self.authors = {}
+        missing = keys - self.authors.keys()
+        if missing:
+            last_names = {last for first, last in missing}
+            for pk, first, last in Author.objects.filter(last_name__in=last_names).values_list("pk", "first_name", "last_name"):
+                self.authors.setdefault((first, last), pk)
+            new = [Author(first_name=first, last_name=last) for first, last in missing - self.authors.keys()]
+            for author in Author.objects.bulk_create(new):
+                self.authors[(author.first_name, author.last_name)] = author.pk
+            search.index_authors(new)
+        return self.authors
+
+    def genre_ids(self, rows):
+        names = {name for row in rows for name in row.get("genres", [])}
+        if len(self.genres) > KEY_CACHE_SIZE:
+            self.genres = {}
+        missing = names - self.genres.keys()
+        if missing:
+            self.genres.update(Genre.objects.filter(name__in=missing).values_list("name", "pk"))
+            new = [Genre(name=name) for name in missing - self.genres.keys()]
+            for genre in Genre.objects.bulk_create(new):
+                self.genres[genre.name] = genre.pk
+        return self.genres
+
+    def import_batch(self, rows):
+        with transaction.atomic():
+            authors = self.author_ids(rows)
+            genres = self.genre_ids(rows)
+            rows = {row["isbn"]: row for row in rows}
+            existing = Book.objects.in_bulk(list(rows), field_name="isbn")
+            old_authors = [book.author_id for book in existing.values()]
+            books = []
+            for isbn, row in rows.items():
+                book = existing.get(isbn) or Book(isbn=isbn)
+                book.title = row["title"]
+                book.summary = row.get("summary", "")
+                book.author_id = authors.get((row.get("author_first_name"), row.get("author_last_name")))
+                books.append(book)
+            old = [book for book in books if book.pk is not None]
+            new = [book for book in books if book.pk is None]
+            Book.objects.bulk_create(new)
+            Book.objects.bulk_update(old, ["title", "summary", "author"])
+            self.created += len(new)
+            self.updated += len(old)
+
+            # žanrų M2M tiesiai į tarpinę lentelę
+            Through = Book.genre.through
+            Through.objects.bulk_create([Through(book_id=book.pk, genre_id=genres[name])
+                                         for book in books for name in rows[book.isbn].get("genres", [])],
+                                        ignore_conflicts=True)
+
+            # trūkstami egzemplioriai papildomi iki nurodyto kiekio
+            counts = dict(BookInstance.objects.filter(book__in=books).values_list("book").annotate(Count("pk")))
+            instances = [BookInstance(book_id=book.pk)
+                         for book in books
+                         for _ in range(int(rows[book.isbn].get("copies") or 0) - counts.get(book.pk, 0))]
+            BookInstance.objects.bulk_create(instances)
+            self.copies += len(instances)
+
+            # bulk_create nesiunčia signalų, todėl indeksas ir kešas atnaujinami čia
+            search.index_books(Book.objects.filter(pk__in=[book.pk for book in books]).select_related("author"))
+            caching.invalidate("book_card", *[book.pk for book in old])
+            caching.invalidate("book_info", *[book.pk for book in old])
+            caching.invalidate("book_instances", *{instance.book_id for instance in instances})
+            caching.invalidate("author_books", *{*old_authors, *(book.author_id for book in books)})
+            versions.touch(*versions.TABLES)
+        return len(rows)
@@ -0,0 +1,63 @@
+import asyncio
+from django.db.models import F
+from . import routers
+from .models import Book, BookInstance, Author, Counter
+
+# Pagrindinio puslapio skaitliukai laikomi Counter lentelėje ir keičiami signalais per
+# UPDATE ... SET value = value + n: lygiagretūs procesai nepraranda pakeitimų (kešo incr
+# su DatabaseCache yra get + set), o atšaukta transakcija atšaukia ir skaitliuko pakeitimą.
+# Jei eilučių nėra (pvz., nauja duomenų bazė), jos perskaičiuojamos iš duomenų bazės.
+
+NAMES = ("num_books", "num_instances", "num_instances_available", "num_authors")
+
+
+def compute():
+    return {
+        "num_books": Book.objects.count(),
+        "num_instances": BookInstance.objects.count(),
+        "num_instances_available": BookInstance.objects.filter(status='a').count(),
+        "num_authors": Author.objects.count(),
+    }
+
+
+def store(values):
+    return [Counter(name=name, value=value) for name, value in values.items()]
+
+
+def reconcile():
+    with routers.reading_from_primary():
+        values = compute()
+    Counter.objects.bulk_create(store(values), update_conflicts=True, unique_fields=["name"], update_fields=["value"])
+    return values
+
+
+def get_counters():
+    values = dict(Counter.objects.values_list("name", "value"))
+    if len(values) < len(NAMES):
+        return reconcile()
+    return {name: values[name] for name in NAMES}
+
+
+async def aget_counters():
+    # async variantas: trūkstant eilučių keturi COUNT vykdomi kartu per asyncio.gather
+    values = {name: value async for name, value in Counter.objects.values_list("name", "value")}
+    if len(values) == len(NAMES):
+        return {name: values[name] for name in NAMES}
+    with routers.reading_from_primary():
+        counts = await asyncio.gather(
+            Book.objects.acount(),
+            BookInstance.objects.acount(),
+            BookInstance.objects.filter(status='a').acount(),
+            Author.objects.acount(),
+        )
+    values = dict(zip(NAMES, counts))
+    await Counter.objects.abulk_create(store(values), update_conflicts=True, unique_fields=["name"],
+                                       update_fields=["value"])
+    return values
+
+
+def adjust(**deltas):
+    # keičiama toje pačioje transakcijoje kaip ir pats įrašas
+    for name, delta in deltas.items():
+        if delta:
+            Counter.objects.filter(name=name).update(value=F("value") + delta)
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import User
 from .models import BookReview, Profile, BookInstance
 from django import forms
+from django.utils.translation import gettext_lazy as _
 
 class BookReviewForm(forms.ModelForm):
     class Meta:
@@ -19,7 +20,69 @@ class ProfileChangeForm(forms.ModelForm):
 
 
 class InstanceUpdateForm(forms.ModelForm):
+    # būsena, kurią matė redaguotojas: jei kas nors ją pakeitė, forma neįrašoma (library/loans.py)
+    expected_status = forms.CharField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["expected_status"].initial = self.instance.status
+
     class Meta:
         model = BookInstance
         fields = ['book', 'status', 'reader', 'due_back']
         widgets = {'due_back': forms.DateInput(attrs={"type": "date"})}
+
+
+class ExpectedStatusSelect(forms.Select):
+    # admin atvaizduoja tik išvardytus laukus (sąraše - tik list_editable), todėl paslėpta
+    # expected_status reikšmė įdedama šalia būsenos pasirinkimo
+    expected = None
+
+    def render(self, name, value, attrs=None, renderer=None):
+        hidden = forms.HiddenInput().render(name.removesuffix("status") + "expected_status", self.expected,
+                                            renderer=renderer)
+        return super().render(name, value, attrs, renderer) + hidden
+
+
+class InstanceAdminForm(forms.ModelForm):
+    # egzemplioriaus admin forma ir list_editable sąrašas: kaip InstanceUpdateForm
+    expected_status = forms.CharField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["expected_status"].initial = self.instance.status
+        if "status" in self.fields:
+            widget = self.fields["status"].widget = ExpectedStatusSelect(choices=self.fields["status"].choices)
+            widget.expected = self["expected_status"].value()
+
+    class Meta:
+        model = BookInstance
+        fields = ['book', 'status', 'reader', 'due_back']
+
+
+class InstanceFilterForm(forms.Form):
+    status = forms.ChoiceField(label=_("Status"), required=False,
+                               choices=[("", "---------")] + list(BookInstance.LOAN_STATUS))
+    due_back_from = forms.DateField(label=_("Due Back"), required=False,
+                                    widget=forms.DateInput(attrs={"type": "date"}))
+    due_back_to = forms.DateField(label="-", required=False,
+                                  widget=forms.DateInput(attrs={"type": "date"}))
+    book = forms.IntegerField(label=_("Book") + " ID", required=False, min_value=1)
+    reader = forms.CharField(label=_("Reader"), required=False)
+
+    def filter(self, queryset):
+        # filtrai atitinka BookInstance.Meta.indexes
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data["status"]:
+            queryset = queryset.filter(status=data["status"])
+        if data["due_back_from"]:
+            queryset = queryset.filter(due_back__gte=data["due_back_from"])
+        if data["due_back_to"]:
+            queryset = queryset.filter(due_back__lte=data["due_back_to"])
+        if data["book"]:
+            queryset = queryset.filter(book_id=data["book"])
+        if data["reader"]:
+            queryset = queryset.filter(reader__username=data["reader"])
+        return queryset
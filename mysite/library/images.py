@@ -0,0 +1,64 @@
+import glob
+import hashlib
+import os
+import uuid
+from PIL import Image, ImageOps
+
+# Paveikslėlių versijos (renditions) laikomos MEDIA_ROOT/renditions/<turinio sha256>/
+# kataloge, todėl tas pats turinys apdorojamas tik kartą, o pasikeitęs turinys
+# gauna naują kelią. Modulis neimportuoja Django modelių, kad jį galėtų naudoti
+# atskiri darbiniai procesai.
+
+FORMATS = ("webp", "jpg")
+
+
+def digest(field_file):
+    sha = hashlib.sha256()
+    field_file.open("rb")
+    for chunk in field_file.chunks():
+        sha.update(chunk)
+    field_file.seek(0)
+    return sha.hexdigest()
+
+
+def rendition_name(content_hash, width, square, fmt):
+    suffix = "-square" if square else ""
+    return f"renditions/{content_hash}/{width}{suffix}.{fmt}"
+
+
+def render(source_path, dest_path, width, square, fmt):
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if square:
+            min_side = min(img.width, img.height)
+            left = (img.width - min_side) // 2
+            top = (img.height - min_side) // 2
+            img = img.crop((left, top, left + min_side, top + min_side))
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        if fmt == "jpg" and img.mode != "RGB":
+            img = img.convert("RGB")
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        img.save(tmp_path, format="JPEG" if fmt == "jpg" else fmt.upper(), quality=85)
+        os.replace(tmp_path, dest_path)
+
+
+def generate(source_path, media_root, content_hash, widths, square):
+    for width in widths:
+        for fmt in FORMATS:
+            dest_path = os.path.join(media_root, rendition_name(content_hash, width, square, fmt))
+            if not os.path.exists(dest_path):
+                render(source_path, dest_path, width, square, fmt)
+
+
+def evict(media_root, content_hash, square):
+    directory = os.path.join(media_root, "renditions", content_hash)
+    pattern = "*-square.*" if square else "[0-9]*[0-9].*"
+    for path in glob.glob(os.path.join(directory, pattern)):
+        os.remove(path)
+    try:
+        os.rmdir(directory)
+    except OSError:
+        # dar liko kito tipo versijų arba katalogo nėra
+        pass
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from .models import BookInstance, Hold, Loan
+from . import caching, counters, versions
+
+# Egzempliorių išdavimas, grąžinimas, rezervavimas ir pratęsimas. Kiekviena
+# operacija yra vienas sąlyginis UPDATE ... WHERE status = <tikėtina būsena>:
+# jei kitas bibliotekininkas spėjo pirmas, atnaujinama 0 eilučių ir operacija
+# nutraukiama LoanError, todėl vienas egzempliorius negali būti išduotas dukart.
+# update() nesiunčia signalų, todėl skaitliukai ir kešas atnaujinami čia.
+
+
+class LoanError(Exception):
+    pass
+
+
+def default_due_back():
+    return timezone.now().date() + timedelta(days=settings.LIBRARY_LOAN_DAYS)
+
+
+def pk_of(obj):
+    return obj.pk if obj is not None else None
+
+
+def transition(instance, old_status, condition=Q(), **changes):
+    new_status = changes.get("status", old_status)
+    with transaction.atomic():
+        if not BookInstance.objects.filter(condition, pk=instance.pk, status=old_status).update(**changes):
+            raise LoanError(_("The book instance has been changed by someone else."))
+        open_loans = Loan.objects.filter(instance_id=instance.pk, date_returned__isnull=True)
+        if old_status == 't' and new_status != 't':
+            open_loans.update(date_returned=timezone.now())
+        elif new_status == 't' and old_status != 't':
+            Loan.objects.create(instance_id=instance.pk,
+                                reader_id=pk_of(changes["reader"]) if "reader" in changes else instance.reader_id,
+                                due_back=changes.get("due_back", instance.due_back))
+        elif new_status == 't':
+            open_loans.update(**{field: changes[field] for field in ("reader", "due_back") if field in changes})
+        counters.adjust(num_instances_available=int(new_status == 'a') - int(old_status == 'a'))
+        versions.touch("instance")
+        for name in ("book_instances", "book_card"):
+            caching.invalidate(name, instance.book_id, pk_of(changes.get("book")))
+    for field, value in changes.items():
+        setattr(instance, field, value)
+    return instance
+
+
+def checkout(instance, reader, due_back=None):
+    # laisvą egzempliorių arba šio skaitytojo rezervuotą (tada jo eilės įrašas uždaromas)
+    if reader is None:
+        raise LoanError(_("A book instance can only be checked out to a reader."))
+    changes = {"status": 't', "reader": reader, "due_back": due_back or default_due_back()}
+    try:
+        return transition(instance, 'a', **changes)
+    except LoanError:
+        with transaction.atomic():
+            transition(instance, 'r', Q(reader=reader), **changes)
+            Hold.objects.filter(instance_id=instance.pk, reader=reader, status='r').update(status='c')
+        return instance
+
+
+def checkin(instance):
+    # grąžintas (ar neatsiimtas) egzempliorius tame pačiame sandoryje rezervuojamas pirmajam eilėje
+    with transaction.atomic():
+        Hold.objects.filter(instance_id=instance.pk, status='r').update(status='x')
+        changes = handover_changes(instance)
+        try:
+            return transition(instance, 't', **changes)
+        except LoanError:
+            return transition(instance, 'r', **changes)
+
+
+def reserve(instance, reader):
+    return transition(instance, 'a', status='r', reader=reader, due_back=None)
+
+
+def renew(instance, reader, due_back=None):
+    return transition(instance, 't', Q(reader=reader), due_back=due_back or default_due_back())
+
+
+# Eilė (Hold) knygai. Pirmasis laukiantis randamas per dalinį indeksą (book, id)
+# WHERE status = 'w', o paimamas sąlyginiu UPDATE ... WHERE status = 'w', todėl du
+# vienu metu grąžinti egzemplioriai negali atitekti tam pačiam skaitytojui.
+
+
+def hold_expiry(days):
+    return timezone.now() + timedelta(days=days)
+
+
+def claim_hold(book_id, instance_id):
+    while True:
+        hold = Hold.objects.waiting(book_id).filter(expires_at__gt=timezone.now()).select_related("reader").first()
+        if hold is None:
+            return None
+        if Hold.objects.filter(pk=hold.pk, status='w').update(
+                status='r', instance_id=instance_id, expires_at=hold_expiry(settings.LIBRARY_HOLD_PICKUP_DAYS)):
+            return hold
+
+
+def handover_changes(instance):
+    hold = claim_hold(instance.book_id, instance.pk) if instance.book_id else None
+    if hold is None:
+        return {"status": 'a', "reader": None, "due_back": None}
+    return {"status": 'r', "reader": hold.reader, "due_back": None}
+
+
+def place_hold(book, reader):
+    # pakartotinai stojant į eilę grąžinamas esamas įrašas
+    try:
+        with transaction.atomic():
+            hold = Hold.objects.create(book_id=pk_of(book), reader=reader,
+                                       expires_at=hold_expiry(settings.LIBRARY_HOLD_DAYS))
+    except IntegrityError:
+        return Hold.objects.active().get(book_id=pk_of(book), reader=reader)
+    promote(pk_of(book))
+    return hold
+
+
+def release(hold, status='x'):
+    # atšaukta ar pasibaigusi eilė; paruoštas egzempliorius atiduodamas kitam laukiančiam
+    with transaction.atomic():
+        if not Hold.objects.filter(pk=hold.pk, status__in=('w', 'r')).update(status=status):
+            return False
+        if hold.status == 'r' and hold.instance_id:
+            instance = BookInstance.objects.get(pk=hold.instance_id)
+            try:
+                with transaction.atomic():
+                    transition(instance, 'r', Q(reader_id=hold.reader_id), **handover_changes(instance))
+            except LoanError:
+                # egzempliorių jau pakeitė bibliotekininkas
+                pass
+    return True
+
+
+def promote(book_id):
+    # laisvi egzemplioriai atiduodami laukiantiems (pvz., pridėjus naują egzempliorių)
+    promoted = 0
+    for instance in list(BookInstance.objects.filter(book_id=book_id, status='a').order_by("pk")):
+        try:
+            with transaction.atomic():
+                hold = claim_hold(book_id, instance.pk)
+                if hold is None:
+                    break
+                transition(instance, 'a', status='r', reader=hold.reader, due_back=None)
+        except LoanError:
+            continue
+        promoted += 1
+    return promoted
+
+
+def expire_holds(batch_size=1000):
+    # periodinis valymas (manage.py expire_holds): laukiantys nutraukiami paketais vienu UPDATE,
+    # neatsiimti paruošti egzemplioriai perduodami toliau, laisvi egzemplioriai atiduodami eilei
+    now, expired = timezone.now(), 0
+    while pks := list(Hold.objects.filter(status='w', expires_at__lte=now).values_list("pk", flat=True)[:batch_size]):
+        expired += Hold.objects.filter(pk__in=pks, status='w').update(status='x')
+    while holds := list(Hold.objects.filter(status='r', expires_at__lte=now).order_by("pk")[:batch_size]):
+        expired += sum(release(hold) for hold in holds)
+    available = BookInstance.objects.filter(book=OuterRef("book"), status='a')
+    books = (Hold.objects.filter(status='w').filter(Exists(available))
+             .order_by("book").values_list("book", flat=True).distinct())
+    promoted = sum(promote(book_id) for book_id in list(books))
+    return expired, promoted
+
+
+def update(instance, expected_status, old_book_id=None, **changes):
+    # redagavimo formoms: pakeitimai įrašomi tik jei būsena vis dar tokia, kokią matė redaguotojas
+    transition(instance, expected_status, **changes)
+    caching.invalidate("book_instances", old_book_id)
+    caching.invalidate("book_card", old_book_id)
+    return instance
@@ -0,0 +1,44 @@
+import asyncio
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from library import benchmark
+
+CATALOGUE = ("index", "books", "book", "search", "authors")
+
+
+class Command(BaseCommand):
+    help = ("Palygina katalogo rodinių pralaidumą per WSGI (gijos) ir ASGI (įvykių ciklas) esant "
+            "dideliam lygiagretumui. Async rodiniai naudojami paleidus su LIBRARY_ASYNC_VIEWS=1")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1000)
+        parser.add_argument("--requests", type=int, default=500, help="Užklausų skaičius kiekvienam maršrutui")
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--output", help="JSON rezultatų failas")
+
+    def handle(self, *args, **options):
+        with benchmark.test_database(), override_settings(ALLOWED_HOSTS=["*"]):
+            cache.clear()
+            user = benchmark.seed(options["scale"])
+            client = Client()
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            results = {"async_views": settings.LIBRARY_ASYNC_VIEWS, "concurrency": options["concurrency"],
+                       "wsgi": {}, "asgi": {}}
+            for name, method, url, data in benchmark.scenarios(user):
+                if name not in CATALOGUE:
+                    continue
+                results["wsgi"][name] = benchmark.wsgi_load(url, cookie, options["requests"], options["concurrency"])
+                results["asgi"][name] = asyncio.run(
+                    benchmark.asgi_load(url, cookie, options["requests"], options["concurrency"]))
+                self.stdout.write(f"{name:10} wsgi {results['wsgi'][name]['rps']:>8.1f} rps "
+                                  f"p95 {results['wsgi'][name]['p95_ms']:>8.1f} ms   "
+                                  f"asgi {results['asgi'][name]['rps']:>8.1f} rps "
+                                  f"p95 {results['asgi'][name]['p95_ms']:>8.1f} ms")
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
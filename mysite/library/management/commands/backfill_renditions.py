@@ -0,0 +1,56 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from library import caching, images, tasks
+from library.models import Book, BookReview, Profile
+
+
+class Command(BaseCommand):
+    help = ("Užpildo cover_hash ir photo_hash įrašams, įkeltiems prieš atsirandant paveikslėlių versijoms, "
+            "ir užsako jų versijas (be hash rodomas originalus failas)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model in (Book, Profile):
+            for name, (hash_field, widths, square) in model.renditions.items():
+                done, missing = self.backfill(model, name, hash_field, widths, square, options["batch_size"])
+                self.stdout.write(f"{model._meta.model_name}.{hash_field}: {done}, nerasta failų {missing}")
+
+    def backfill(self, model, name, hash_field, widths, square, batch_size):
+        queryset = (model.objects.filter(**{hash_field: ""}).exclude(**{name: ""}).exclude(**{name: None})
+                    .only("pk", name).order_by("pk"))
+        done = missing = last_pk = 0
+        while True:
+            # puslapiai pagal pk: kursorius perskaitomas iki galo prieš rašant į tą pačią lentelę
+            batch, seen = [], 0
+            for obj in queryset.filter(pk__gt=last_pk)[:batch_size].iterator(chunk_size=batch_size):
+                seen, last_pk = seen + 1, obj.pk
+                image = getattr(obj, name)
+                if not os.path.exists(image.path):
+                    missing += 1
+                    continue
+                setattr(obj, hash_field, images.digest(image))
+                batch.append(obj)
+            if batch:
+                self.save(model, batch, name, hash_field, widths, square)
+                done += len(batch)
+            if seen < batch_size:
+                return done, missing
+
+    def save(self, model, batch, name, hash_field, widths, square):
+        # bulk_update nesiunčia signalų, todėl fragmentai su paveikslėliais invaliduojami čia
+        pks = [obj.pk for obj in batch]
+        with transaction.atomic():
+            model.objects.bulk_update(batch, [hash_field])
+            if model is Book:
+                caching.invalidate("book_card", *pks)
+                caching.invalidate("book_info", *pks)
+            else:
+                book_pks = BookReview.objects.filter(reviewer__profile__in=pks).values_list("book_id", flat=True)
+                caching.invalidate("book_reviews", *set(book_pks))
+            for obj in batch:
+                tasks.submit(images.generate, getattr(obj, name).path, settings.MEDIA_ROOT,
+                             getattr(obj, hash_field), widths, square)
@@ -0,0 +1,72 @@
+import json
+import subprocess
+import tempfile
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from library import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Sukuria atskirą testinę duomenų bazę, užpildo ją sintetiniu katalogu ir "
+            "išmatuoja kiekvieną library.urls maršrutą; rezultatai rašomi į JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1000, help="Knygų skaičius (10^3-10^6)")
+        parser.add_argument("--requests", type=int, default=20, help="Užklausų skaičius kiekvienam maršrutui")
+        parser.add_argument("--concurrency", type=int, default=0,
+                            help="Jei > 0, papildomai matuojama per HTTP serverį su tiek lygiagrečių klientų")
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--compare", help="Ankstesnis rezultatų failas; regresijos atveju komanda nepavyksta")
+        parser.add_argument("--threshold", type=float, default=1.25, help="Leistinas p95 padidėjimas (kartais)")
+
+    def handle(self, *args, **options):
+        with benchmark.test_database(), override_settings(ALLOWED_HOSTS=["*"], LIBRARY_TASKS_EAGER=True,
+                                                          MEDIA_ROOT=tempfile.mkdtemp()):
+            cache.clear()
+            results = self.run(options)
+
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+        for name, row in results["routes"].items():
+            self.stdout.write(f"{name:24} {row['status']:>4} {row['queries']:>4} q  "
+                              f"p50 {row['p50_ms']:>8.1f}  p95 {row['p95_ms']:>8.1f} ms  {row['rps']:>8.1f} rps")
+        for name, row in results.get("server", {}).items():
+            self.stdout.write(f"http {name:19} {row['errors']:>4} err  "
+                              f"p50 {row['p50_ms']:>8.1f}  p95 {row['p95_ms']:>8.1f} ms  {row['rps']:>8.1f} rps")
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                regressions = benchmark.compare(results, json.load(file), options["threshold"])
+            if regressions:
+                raise CommandError("Našumo regresijos:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Regresijų nerasta"))
+
+    def run(self, options):
+        started = time.perf_counter()
+        user = benchmark.seed(options["scale"])
+        self.stdout.write(f"Katalogas ({options['scale']} knygų) sukurtas per {time.perf_counter() - started:.1f} s")
+        client = Client()
+        client.force_login(user)
+        routes = benchmark.scenarios(user)
+        results = {
+            "commit": self.commit(),
+            "scale": options["scale"],
+            "requests": options["requests"],
+            "routes": benchmark.measure(client, routes, options["requests"]),
+        }
+        if options["concurrency"]:
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            results["server"] = benchmark.load_test(routes, cookie, options["requests"] * options["concurrency"],
+                                                    options["concurrency"])
+        return results
+
+    def commit(self):
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=settings.BASE_DIR).stdout.strip() or None
+        except OSError:
+            return None
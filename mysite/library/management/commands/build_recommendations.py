@@ -0,0 +1,27 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from library import recommendations
+
+
+class Command(BaseCommand):
+    help = "Perskaičiuoja knygų rekomendacijas (paleisti periodiškai, pvz., cron su --since)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat,
+                            help="Tik knygos, susijusios su išdavimais nuo šios datos (YYYY-MM-DD), ir knygos be rekomendacijų")
+        parser.add_argument("--top", type=int, help="Kiek panašių knygų saugoti (LIBRARY_RECOMMENDATIONS)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        engine = recommendations.Engine(options["top"]).load()
+        self.stdout.write(f"Duomenys užkrauti per {time.monotonic() - started:.1f} s: "
+                          f"{len(engine.readers)} knygų su skaitytojais, {len(engine.genre_sets)} žanrų rinkinių")
+        books = engine.affected_books(options["since"]) if options["since"] else recommendations.all_books()
+        total = 0
+        for total in engine.build(books, options["batch_size"]):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{total} knygų, {total / elapsed:.0f} knygų/s")
+        self.stdout.write(self.style.SUCCESS(f"Rekomendacijos perskaičiuotos {total} knygų "
+                                             f"per {time.monotonic() - started:.1f} s"))
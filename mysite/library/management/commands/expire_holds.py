@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from library import loans
+
+
+class Command(BaseCommand):
+    help = "Nutraukia pasibaigusias eiles ir atiduoda laisvus egzempliorius laukiantiems (paleisti periodiškai, pvz., cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired, promoted = loans.expire_holds(options["batch_size"])
+        self.stdout.write(f"Pasibaigė {expired} eilės įrašų, rezervuota {promoted} egzempliorių")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from library import catalogue
+
+
+class Command(BaseCommand):
+    help = "Eksportuoja katalogą į CSV arba JSONL (formatas tinka import_catalogue komandai)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Failas arba '-' (standartinė išvestis)")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="jsonl")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rows = catalogue.export_rows(options["chunk_size"])
+        if options["path"] == "-":
+            catalogue.write_rows(self.stdout, options["format"], rows)
+            return
+        with open(options["path"], "w", encoding="utf-8", newline="") as file:
+            catalogue.write_rows(file, options["format"], rows)
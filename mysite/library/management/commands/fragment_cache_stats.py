@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from library import caching
+
+
+class Command(BaseCommand):
+    help = ("Rodo šablonų fragmentų kešo pataikymų ir nepataikymų statistiką (LIBRARY_FRAGMENT_STATS=1; "
+            "kiekvienas procesas ją įrašo kas caching.STATS_FLUSH_EVERY fragmentų)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Išvalyti statistiką")
+
+    def handle(self, *args, **options):
+        if not caching.is_shared():
+            # komanda veikia atskirame procese ir su LocMemCache matytų tik savo tuščią kešą
+            raise CommandError("Statistika prieinama tik su bendru kešu visiems procesams (LIBRARY_CACHE_URL)")
+        if not settings.LIBRARY_FRAGMENT_STATS:
+            self.stderr.write("Įspėjimas: statistika nerenkama, įjungiama LIBRARY_FRAGMENT_STATS=1")
+        for name, counts in caching.stats().items():
+            total = counts["hit"] + counts["miss"]
+            ratio = counts["hit"] / total * 100 if total else 0
+            self.stdout.write(f"{name:16} hit {counts['hit']:>8}  miss {counts['miss']:>8}  {ratio:5.1f}%")
+        if options["reset"]:
+            caching.reset_stats()
@@ -0,0 +1,29 @@
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand
+from library import catalogue, counters
+
+
+class Command(BaseCommand):
+    help = "Importuoja knygas, autorius, žanrus ir egzempliorius iš CSV arba JSONL failo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Pagal nutylėjimą - pagal failo plėtinį")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or ("csv" if options["path"].endswith(".csv") else "jsonl")
+        importer = catalogue.Importer()
+        started = time.monotonic()
+        total = 0
+        with open(options["path"], encoding="utf-8", newline="") as file:
+            rows = catalogue.read_rows(file, fmt)
+            while batch := list(islice(rows, options["batch_size"])):
+                total += importer.import_batch(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{total} knygų, {total / elapsed:.0f} eil./s")
+        counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f"Sukurta {importer.created}, atnaujinta {importer.updated} knygų, "
+            f"pridėta {importer.copies} egzempliorių per {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,46 @@
+import json
+import math
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def percentile(values, p):
+    # artimiausio rango metodas; values - surūšiuotas sąrašas
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = "Suskaičiuoja PerformanceMiddleware žurnalo p50/p95/p99 pagal URL pavadinimą"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=str(settings.BASE_DIR / "performance.log"),
+                            help="Žurnalo failas arba '-' (standartinė įvestis)")
+        parser.add_argument("--metric", default="total_ms",
+                            choices=["total_ms", "sql_ms", "sql_count", "template_ms", "peak_kb"])
+
+    def handle(self, *args, **options):
+        metric = options["metric"]
+        groups = defaultdict(list)
+        duplicates = defaultdict(int)
+        file = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8")
+        with file:
+            for line in file:
+                try:
+                    entry = json.loads(line[line.index("{"):])
+                except ValueError:
+                    continue
+                if entry.get(metric) is None:
+                    continue
+                name = entry.get("url_name") or entry.get("path")
+                groups[name].append(entry[metric])
+                duplicates[name] = max(duplicates[name], entry.get("duplicate_queries", 0))
+
+        self.stdout.write(f"{'url':32} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max dup':>8}  ({metric})")
+        rows = []
+        for name, values in groups.items():
+            values.sort()
+            rows.append((percentile(values, 95), name, len(values), percentile(values, 50), percentile(values, 99)))
+        for p95, name, count, p50, p99 in sorted(rows, reverse=True):
+            self.stdout.write(f"{name:32} {count:>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {duplicates[name]:>8}")
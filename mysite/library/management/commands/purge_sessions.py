@@ -0,0 +1,25 @@
+import time
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Ištrina pasibaigusias sesijas dalimis, kad SQLite rašymo užraktas nebūtų laikomas ilgai"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--pause", type=float, default=0, help="Pauzė sekundėmis tarp dalių")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            # expire_date stulpelis indeksuotas
+            keys = list(Session.objects.filter(expire_date__lt=now)
+                        .values_list("session_key", flat=True)[:options["batch_size"]])
+            if not keys:
+                break
+            total += Session.objects.filter(session_key__in=keys).delete()[0]
+            time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Ištrinta sesijų: {total}"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from library.models import Book, Author
+from library import search
+
+
+class Command(BaseCommand):
+    help = "Perkuria knygų ir autorių paieškos indeksą"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        search.create_index()
+        search.clear()
+        books = Book.objects.select_related("author").order_by("pk")
+        self.index(books, search.index_books, batch_size)
+        self.index(Author.objects.order_by("pk"), search.index_authors, batch_size)
+        self.stdout.write(self.style.SUCCESS("Paieškos indeksas perkurtas"))
+
+    def index(self, queryset, index, batch_size):
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                index(batch)
+                batch = []
+        index(batch)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from library import counters
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = "Perskaičiuoja pagrindinio puslapio skaitliukus ir knygų atsiliepimų suvestines (paleisti periodiškai, pvz., cron)"
+
+    def handle(self, *args, **options):
+        for name, value in counters.reconcile().items():
+            self.stdout.write(f"{name}: {value}")
+        self.stdout.write(f"review stats: {Book.objects.refresh_review_stats()} books")
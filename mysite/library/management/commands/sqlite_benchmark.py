@@ -0,0 +1,54 @@
+import multiprocessing
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from library import benchmark, sqliteload
+
+# numatytieji Python sqlite3 / Django nustatymai palyginimui
+DEFAULT_CONFIG = {"init": ["PRAGMA journal_mode=DELETE", "PRAGMA synchronous=FULL"], "immediate": False, "timeout": 5}
+
+
+def tuned_config():
+    options = settings.DATABASES["default"].get("OPTIONS", {})
+    return {
+        "init": [statement for statement in options.get("init_command", "").split(";") if statement.strip()],
+        "immediate": options.get("transaction_mode") == "IMMEDIATE",
+        "timeout": options.get("timeout", 5),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Palygina numatytųjų ir settings.DATABASES SQLite nustatymų pralaidumą, "
+            "kai keli procesai vienu metu skaito ir rašo")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=5, help="Sekundės kiekvienai konfigūracijai")
+        parser.add_argument("--write-ratio", type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Komanda skirta tik SQLite")
+        with benchmark.test_database() as path:
+            benchmark.seed(options["scale"])
+            connection.close()
+            for name, config in (("default", DEFAULT_CONFIG), ("tuned", tuned_config())):
+                reads, writes, errors = self.run(path, config, options)
+                total = options["duration"]
+                self.stdout.write(f"{name:8} skaitymai {reads / total:>9.1f}/s  rašymai {writes / total:>8.1f}/s  "
+                                  f"klaidos (locked) {errors:>6}")
+
+    def run(self, path, config, options):
+        # journal_mode išsaugomas faile: perjungiama vieną kartą, kol darbininkai dar neprisijungę
+        with closing(sqlite3.connect(path)) as setup:
+            for statement in config["init"]:
+                setup.execute(statement)
+        with ProcessPoolExecutor(options["workers"], mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(sqliteload.worker, path, config, options["duration"], options["write_ratio"], seed)
+                       for seed in range(options["workers"])]
+            results = [future.result() for future in futures]
+        return [sum(values) for values in zip(*results)]
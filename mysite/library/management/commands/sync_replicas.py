@@ -0,0 +1,20 @@
+import sqlite3
+from contextlib import closing
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Nukopijuoja pagrindinę SQLite bazę į LIBRARY_REPLICAS failus (vietinis replikacijos pakaitalas)"
+
+    def handle(self, *args, **options):
+        primary = connections["default"]
+        if primary.vendor != "sqlite":
+            raise CommandError("Tikroms replikoms naudokite duomenų bazės replikaciją")
+        with closing(sqlite3.connect(primary.settings_dict["NAME"])) as source:
+            for alias in settings.LIBRARY_REPLICAS:
+                connections[alias].close()
+                with closing(sqlite3.connect(connections[alias].settings_dict["NAME"])) as target:
+                    source.backup(target)
+                self.stdout.write(f"{alias}: {connections[alias].settings_dict['NAME']}")
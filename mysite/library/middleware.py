@@ -0,0 +1,106 @@
+import json
+import logging
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+# Užklausos našumo matavimas: bendras laikas, SQL užklausų skaičius ir laikas,
+# pasikartojančios užklausos (N+1), šablonų atvaizdavimo laikas ir, jei įjungta,
+# didžiausia atminties sąnaudų reikšmė. Rezultatas - Server-Timing antraštė ir
+# viena JSON eilutė žurnale "library.performance" (žr. performance_report komandą).
+
+logger = logging.getLogger("library.performance")
+current = ContextVar("library_performance", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.queries.items() if count > 1}
+
+
+def timed_render(render):
+    # skaičiuojamas tik išorinis šablonas, kad {% include %} nebūtų sumuojami du kartus
+    def wrapper(self, context):
+        stats = current.get()
+        if stats is None or stats.rendering:
+            return render(self, context)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_time += time.perf_counter() - started
+            stats.rendering = False
+    wrapper.timed = True
+    return wrapper
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not settings.LIBRARY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if not getattr(Template._render, "timed", False):
+            Template._render = timed_render(Template._render)
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current.set(stats)
+        memory = settings.LIBRARY_PROFILING_MEMORY and not tracemalloc.is_tracing()
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # keli alias gali rodyti į tą pačią jungtį (pvz., replikų veidrodžiai testuose)
+                for connection in {id(connection): connection for connection in connections.all()}.values():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+
+        duplicates = stats.duplicates
+        timings = [f'total;dur={total * 1000:.1f}',
+                   f'db;dur={stats.sql_time * 1000:.1f};desc="{sum(stats.queries.values())} queries"',
+                   f'tpl;dur={stats.template_time * 1000:.1f}']
+        response["Server-Timing"] = ", ".join(timings)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            "url_name": match.view_name if match else None,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "sql_count": sum(stats.queries.values()),
+            "sql_ms": round(stats.sql_time * 1000, 2),
+            "duplicate_queries": sum(count - 1 for count in duplicates.values()),
+            "worst_duplicate": max(duplicates, key=duplicates.get) if duplicates else None,
+            "template_ms": round(stats.template_time * 1000, 2),
+            "peak_kb": peak // 1024 if peak is not None else None,
+        }, ensure_ascii=False))
+        return response
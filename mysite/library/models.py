@@ -1,30 +1,102 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 import uuid
 from django.contrib.auth.models import User
 from django.utils import timezone
 from tinymce.models import HTMLField
-from PIL import Image
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from . import images, tasks
 
-class Profile(models.Model):
+
+class RenditionsMixin:
+    # {paveikslėlio laukas: (turinio hash laukas, pločiai, ar kirpti kvadratu)}
+    renditions = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_images(self):
+        loaded = getattr(self, "_loaded_values", {})
+        return [name for name in self.renditions
+                if (getattr(self, name).name or "") != (loaded.get(name) or "")]
+
+    def save(self, *, force_insert=False, force_update=False, using=None, update_fields=None):
+        # versijos generuojamos fone ir tik tada, kai pasikeitė paveikslėlis
+        changed = self.changed_images()
+        loaded = getattr(self, "_loaded_values", {})
+        for name in changed:
+            hash_field = self.renditions[name][0]
+            image = getattr(self, name)
+            setattr(self, hash_field, images.digest(image) if image else "")
+            if update_fields is not None:
+                update_fields = {*update_fields, hash_field}
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+        for name in changed:
+            hash_field, widths, square = self.renditions[name]
+            image = getattr(self, name)
+            self._loaded_values = {**getattr(self, "_loaded_values", {}),
+                                   name: image.name, hash_field: getattr(self, hash_field)}
+            if loaded.get(hash_field):
+                self.evict_renditions(name, loaded[hash_field])
+            if image:
+                tasks.submit(images.generate, image.path, settings.MEDIA_ROOT,
+                             getattr(self, hash_field), widths, square)
+
+    def evict_renditions(self, name, content_hash):
+        # senos versijos trinamos, jei joks kitas įrašas nenaudoja to paties turinio
+        hash_field, widths, square = self.renditions[name]
+
+        def evict():
+            if not type(self).objects.filter(**{hash_field: content_hash}).exists():
+                images.evict(settings.MEDIA_ROOT, content_hash, square)
+        transaction.on_commit(evict)
+
+    @classmethod
+    def find_rendition_source(cls, content_hash, width, square):
+        for name, (hash_field, widths, is_square) in cls.renditions.items():
+            if is_square == square and width in widths:
+                obj = cls.objects.filter(**{hash_field: content_hash}).exclude(**{name: ""}).first()
+                if obj:
+                    return getattr(obj, name)
+        return None
+
+    def rendition_url(self, name, width, fmt="webp"):
+        # versija sugeneruojama per pirmą užklausą (views.rendition), jei fone dar nespėta
+        hash_field, widths, square = self.renditions[name]
+        image = getattr(self, name)
+        if not image:
+            return ""
+        if not getattr(self, hash_field):
+            return image.url
+        return settings.MEDIA_URL + images.rendition_name(getattr(self, hash_field), width, square, fmt)
+
+    def rendition_srcset(self, name, fmt="webp"):
+        widths = self.renditions[name][1]
+        return ", ".join(f"{self.rendition_url(name, width, fmt)} {width}w" for width in widths)
+
+
+class Profile(RenditionsMixin, models.Model):
     user = models.OneToOneField(to=User, verbose_name=_("User"), on_delete=models.CASCADE)
     photo = models.ImageField(verbose_name=_("Photo"), upload_to="profile_pics", null=True, blank=True)
+    photo_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+
+    renditions = {"photo": ("photo_hash", (30, 60, 300), True)}
 
     def __str__(self):
         return f"{self.user.username} profile"
 
-    def save(self, *, force_insert=False, force_update=False, using=None, update_fields=None):
-        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
-        if self.photo:
-            img = Image.open(self.photo.path)
-            min_side = min(img.width, img.height)
-            left = (img.width - min_side) // 2
-            top = (img.height - min_side) // 2
-            right = left + min_side
-            bottom = top + min_side
-            img = img.crop((left, top, right, bottom))
-            img = img.resize((300, 300), Image.LANCZOS)
-            img.save(self.photo.path)
+
+class Counter(models.Model):
+    # pagrindinio puslapio skaitliukai (library/counters.py)
+    name = models.CharField(max_length=30, primary_key=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
 
 
 class Genre(models.Model):
@@ -55,10 +127,48 @@ class Author(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
-class Book(models.Model):
+def instance_count(**filters):
+    instances = BookInstance.objects.filter(book=models.OuterRef("pk"), **filters).order_by().values("book")
+    return Coalesce(models.Subquery(instances.annotate(count=models.Count("pk")).values("count")), 0)
+
+
+class BookQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.select_related("author").with_availability()
+
+    def for_detail(self):
+        # egzemplioriai ir atsiliepimai užkraunami tik šablone, kai jų fragmentų nėra keše
+        return self.select_related("author").with_availability().prefetch_related("genre")
+
+    def with_availability(self):
+        # kiekvienas skaičius - koreliuota subužklausa per (book, status) indeksą, todėl
+        # skaičiuojama tik rodomoms knygoms ir egzemplioriai į atmintį nekraunami
+        due_back = BookInstance.objects.filter(book=models.OuterRef("pk"), status='t', due_back__isnull=False)
+        return self.annotate(
+            copies_total=instance_count(),
+            copies_available=instance_count(status='a'),
+            copies_taken=instance_count(status='t'),
+            copies_reserved=instance_count(status='r'),
+            next_due_back=models.Subquery(due_back.order_by("due_back").values("due_back")[:1]),
+        )
+
+    def available(self):
+        # EXISTS per dalinį indeksą library_instance_available
+        return self.filter(models.Exists(BookInstance.objects.filter(book=models.OuterRef("pk"), status='a')))
+
+    def refresh_review_stats(self):
+        # review_count ir latest_review_at perskaičiuojami vienu UPDATE (pvz., po bulk_create)
+        reviews = BookReview.objects.filter(book=models.OuterRef("pk")).order_by().values("book")
+        return self.update(
+            review_count=Coalesce(models.Subquery(reviews.annotate(count=models.Count("pk")).values("count")), 0),
+            latest_review_at=models.Subquery(reviews.annotate(latest=models.Max("date_created")).values("latest")),
+        )
+
+
+class Book(RenditionsMixin, models.Model):
     title = models.CharField(verbose_name=_("Title"))
     summary = models.TextField(verbose_name=_("Summary"))
-    isbn = models.CharField(verbose_name="ISBN", max_length=13)
+    isbn = models.CharField(verbose_name="ISBN", max_length=13, unique=True)
     author = models.ForeignKey(to="Author",
                                verbose_name=_("Author"),
                                on_delete=models.SET_NULL,
@@ -66,13 +176,17 @@ class Book(models.Model):
                                related_name="books")
     genre = models.ManyToManyField(to="Genre", verbose_name=_("Genres"))
     cover = models.ImageField(verbose_name=_("Cover"), upload_to="covers", null=True, blank=True)
+    cover_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    # atsiliepimų suvestinė, palaikoma signalais (library/signals.py)
+    review_count = models.PositiveIntegerField(verbose_name=_("Reviews"), default=0, editable=False)
+    latest_review_at = models.DateTimeField(verbose_name=_("Latest Review"), null=True, editable=False)
+
+    objects = BookQuerySet.as_manager()
+
+    renditions = {"cover": ("cover_hash", (150, 300, 600), False)}
 
     def display_genre(self):
-        genres = self.genre.all()
-        result = ""
-        for genre in genres:
-            result += genre.name + ", "
-        return result
+        return ", ".join(genre.name for genre in self.genre.all())
 
     display_genre.short_description = _("Genres")
 
@@ -80,13 +194,26 @@ class Book(models.Model):
     class Meta:
         verbose_name = _("Book")
         verbose_name_plural = _("Books")
+        indexes = [
+            # BookListView rūšiavimas ir puslapiavimas pagal raktą
+            models.Index(fields=["title", "id"]),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class BookInstanceQuerySet(models.QuerySet):
+    def for_reader(self, reader):
+        return self.filter(reader=reader).select_related("book")
+
+    def due_by(self, date):
+        # paimti egzemplioriai, kuriuos reikia grąžinti iki nurodytos dienos (indeksas status, due_back)
+        return self.filter(status='t', due_back__lte=date)
+
+
 class BookInstance(models.Model):
-    uuid = models.UUIDField(verbose_name="UUID", default=uuid.uuid4)
+    uuid = models.UUIDField(verbose_name="UUID", default=uuid.uuid4, unique=True)
     due_back = models.DateField(verbose_name=_("Due Back"), null=True, blank=True)
     book = models.ForeignKey(to="Book",
                              verbose_name=_("Book"),
@@ -111,17 +238,32 @@ class BookInstance(models.Model):
                                null=True,
                                blank=True)
 
+    objects = BookInstanceQuerySet.as_manager()
+
     def is_overdue(self):
         return self.due_back and timezone.now().date() > self.due_back
 
     class Meta:
         verbose_name = _("Book Instance")
         verbose_name_plural = _("Book Instances")
+        indexes = [
+            models.Index(fields=["status", "due_back"]),
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["book", "status"]),
+            models.Index(fields=["reader", "status"]),
+            models.Index(fields=["book"], condition=models.Q(status='a'), name="library_instance_available"),
+        ]
 
     def __str__(self):
         return str(self.uuid)
 
 
+class BookReviewQuerySet(models.QuerySet):
+    def for_book(self, book):
+        # puslapiuojama pagal raktą -pk (Meta.ordering), todėl naudojamas (book, id) indeksas
+        return self.filter(book=book).select_related("reviewer__profile")
+
+
 class BookReview(models.Model):
     book = models.ForeignKey(to="Book",
                              verbose_name=_("Book"),
@@ -132,8 +274,136 @@ class BookReview(models.Model):
     date_created = models.DateTimeField(verbose_name=_("Date Created"), auto_now_add=True)
     content = models.TextField(verbose_name=_("Content"))
 
+    objects = BookReviewQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Book Review")
         verbose_name_plural = _("Book Reviews")
         ordering = ['-pk']
 
+
+
+class LoanReminder(models.Model):
+    KINDS = (
+        ('o', _('Overdue')),
+        ('s', _('Due Soon')),
+    )
+    instance = models.ForeignKey(to="BookInstance",
+                                 verbose_name=_("Book Instance"),
+                                 on_delete=models.CASCADE,
+                                 related_name="reminders")
+    reader = models.ForeignKey(to=User, verbose_name=_("Reader"), on_delete=models.CASCADE)
+    kind = models.CharField(verbose_name=_("Kind"), max_length=1, choices=KINDS)
+    due_back = models.DateField(verbose_name=_("Due Back"))
+    date_sent = models.DateTimeField(verbose_name=_("Date Sent"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Loan Reminder")
+        verbose_name_plural = _("Loan Reminders")
+        constraints = [
+            # tas pats priminimas apie tą patį terminą siunčiamas tik kartą
+            models.UniqueConstraint(fields=["instance", "kind", "due_back"], name="library_reminder_once"),
+        ]
+
+
+class Loan(models.Model):
+    # egzemplioriaus išdavimų istorija; įrašus kuria library/loans.py
+    instance = models.ForeignKey(to="BookInstance",
+                                 verbose_name=_("Book Instance"),
+                                 on_delete=models.CASCADE,
+                                 related_name="loans")
+    reader = models.ForeignKey(to=User, verbose_name=_("Reader"), on_delete=models.SET_NULL, null=True)
+    date_out = models.DateTimeField(verbose_name=_("Date Out"), default=timezone.now)
+    due_back = models.DateField(verbose_name=_("Due Back"), null=True, blank=True)
+    date_returned = models.DateTimeField(verbose_name=_("Date Returned"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Loan")
+        verbose_name_plural = _("Loans")
+        ordering = ["-date_out"]
+        indexes = [
+            models.Index(fields=["reader", "date_out"]),
+        ]
+        constraints = [
+            # paskutinė apsauga nuo dvigubo išdavimo: egzempliorius turi ne daugiau kaip vieną atvirą išdavimą
+            models.UniqueConstraint(fields=["instance"], condition=models.Q(date_returned__isnull=True),
+                                    name="library_loan_open_once"),
+        ]
+
+    def __str__(self):
+        return f"{self.instance} - {self.reader}"
+
+
+class BookRecommendationQuerySet(models.QuerySet):
+    def for_book(self, book):
+        return self.filter(book=book).select_related("related__author").order_by("rank")
+
+
+class BookRecommendation(models.Model):
+    # iš anksto apskaičiuotos panašios knygos (library/recommendations.py); rodomos pagal (book, rank) indeksą
+    book = models.ForeignKey(to="Book", on_delete=models.CASCADE, related_name="recommendations", db_index=False)
+    related = models.ForeignKey(to="Book", verbose_name=_("Book"), on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    objects = BookRecommendationQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Book Recommendation")
+        verbose_name_plural = _("Book Recommendations")
+        ordering = ["book", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["book", "rank"], name="library_recommendation_rank"),
+        ]
+
+
+class HoldQuerySet(models.QuerySet):
+    def waiting(self, book):
+        # eilė knygai pagal dalinį indeksą library_hold_queue (book, id)
+        return self.filter(book=book, status='w').order_by("pk")
+
+    def active(self):
+        return self.filter(status__in=('w', 'r'))
+
+    def for_reader(self, reader):
+        # vieta eilėje - laukiančių tos pačios knygos su mažesniu pk skaičius (tik indekso intervalas)
+        ahead = (Hold.objects.filter(book=models.OuterRef("book"), status='w', pk__lte=models.OuterRef("pk"))
+                 .order_by().values("book").annotate(count=models.Count("pk")).values("count"))
+        return (self.active().filter(reader=reader).select_related("book", "instance")
+                .annotate(position=models.Subquery(ahead)).order_by("pk"))
+
+
+class Hold(models.Model):
+    # skaitytojo eilė knygai (library/loans.py): grąžintas egzempliorius rezervuojamas pirmajam laukiančiam
+    HOLD_STATUS = (
+        ('w', _('Waiting')),
+        ('r', _('Ready')),
+        ('c', _('Collected')),
+        ('x', _('Expired')),
+    )
+    book = models.ForeignKey(to="Book", verbose_name=_("Book"), on_delete=models.CASCADE, related_name="holds")
+    reader = models.ForeignKey(to=User, verbose_name=_("Reader"), on_delete=models.CASCADE, related_name="holds")
+    instance = models.ForeignKey(to="BookInstance", verbose_name=_("Book Instance"), on_delete=models.SET_NULL,
+                                 null=True, blank=True, related_name="holds")
+    status = models.CharField(verbose_name=_("Status"), max_length=1, choices=HOLD_STATUS, default='w')
+    date_placed = models.DateTimeField(verbose_name=_("Date Placed"), default=timezone.now)
+    # laukiančiam - kada eilė baigiasi, paruoštam - iki kada atsiimti
+    expires_at = models.DateTimeField(verbose_name=_("Expires At"))
+
+    objects = HoldQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Hold")
+        verbose_name_plural = _("Holds")
+        indexes = [
+            models.Index(fields=["book", "id"], condition=models.Q(status='w'), name="library_hold_queue"),
+            models.Index(fields=["status", "expires_at"]),
+        ]
+        constraints = [
+            # vienas skaitytojas eilėje tai pačiai knygai stovi tik kartą
+            models.UniqueConstraint(fields=["book", "reader"], condition=models.Q(status__in=('w', 'r')),
+                                    name="library_hold_active_once"),
+        ]
+
+    def __str__(self):
+        return f"{self.book} - {self.reader}"
@@ -0,0 +1,157 @@
+import hashlib
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Puslapiavimas pagal raktą (keyset): vietoj OFFSET tęsiama nuo paskutinio
+# parodyto įrašo rūšiavimo rakto, todėl N-tasis puslapis kainuoja tiek pat,
+# kiek pirmasis. Žymės (cursor) yra pasirašytos ir naudotojui neperskaitomos.
+
+SALT = "library.pagination.cursor"
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    def __init__(self, queryset, per_page, ordering=("pk",), approximate_count=False):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = int(per_page)
+        self.ordering = ordering
+        self.approximate_count = approximate_count
+
+    @cached_property
+    def count_key(self):
+        return "library:count:" + hashlib.md5(str(self.queryset.query).encode()).hexdigest()
+
+    @cached_property
+    def count(self):
+        # tikslus COUNT(*) kešuojamas, tad skaičius gali kiek atsilikti nuo tikrovės
+        return cache.get_or_set(self.count_key, self.queryset.count, timeout=settings.LIBRARY_APPROXIMATE_COUNT_TIMEOUT)
+
+    def encode(self, obj, direction):
+        # obj - modelis arba .values() žodynas
+        values = [obj[field.lstrip("-")] if isinstance(obj, dict) else getattr(obj, field.lstrip("-"))
+                  for field in self.ordering]
+        return signing.dumps([direction, values], salt=SALT, compress=True)
+
+    def decode(self, token):
+        try:
+            direction, values = signing.loads(token, salt=SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            return "next", None
+        return direction, values
+
+    def keyset(self, values, forward):
+        # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            ascending = (field[0] != "-") == forward
+            equal = {f.lstrip("-"): value for f, value in zip(self.ordering[:i], values)}
+            condition |= Q(**equal, **{f"{name}__{'gt' if ascending else 'lt'}": values[i]})
+        return condition
+
+    def page_queryset(self, token=None):
+        direction, values = self.decode(token) if token else ("next", None)
+        if direction == "previous":
+            reverse = [field[1:] if field[0] == "-" else f"-{field}" for field in self.ordering]
+            queryset = self.queryset.filter(self.keyset(values, False)).order_by(*reverse)
+        else:
+            queryset = self.queryset.filter(self.keyset(values, True)) if values else self.queryset
+        return queryset[:self.per_page + 1], direction, values
+
+    def make_page(self, rows, direction, values):
+        more = len(rows) > self.per_page
+        if direction == "previous":
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self,
+                              next_token=self.encode(rows[-1], "next") if rows else None,
+                              previous_token=self.encode(rows[0], "previous") if more else None)
+        rows = rows[:self.per_page]
+        return CursorPage(rows, self,
+                          next_token=self.encode(rows[-1], "next") if more else None,
+                          previous_token=self.encode(rows[0], "previous") if values and rows else None)
+
+    def page(self, token=None):
+        queryset, direction, values = self.page_queryset(token)
+        return self.make_page(list(queryset), direction, values)
+
+    async def apage(self, token=None):
+        # async rodinių variantas: šablone neturi likti neįvykdytų užklausų, todėl ir count paskaičiuojamas čia
+        queryset, direction, values = self.page_queryset(token)
+        page = self.make_page([obj async for obj in queryset], direction, values)
+        if self.approximate_count:
+            count = await cache.aget(self.count_key)
+            if count is None:
+                count = await self.queryset.acount()
+                await cache.aset(self.count_key, count, timeout=settings.LIBRARY_APPROXIMATE_COUNT_TIMEOUT)
+            self.count = count
+        return page
+
+
+class CursorPaginationMixin:
+    # ListView priedas: įjungus LIBRARY_CURSOR_PAGINATION, puslapiuojama pagal self.ordering
+    def paginate_queryset(self, queryset, page_size):
+        if not settings.LIBRARY_CURSOR_PAGINATION:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.get_ordering(),
+                                    approximate_count=settings.LIBRARY_CURSOR_APPROXIMATE_COUNT)
+        page = paginator.page(self.request.GET.get("cursor"))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+def paginate(request, queryset, per_page, ordering=("pk",)):
+    queryset = queryset.order_by(*ordering)
+    if settings.LIBRARY_CURSOR_PAGINATION:
+        paginator = CursorPaginator(queryset, per_page, ordering,
+                                    approximate_count=settings.LIBRARY_CURSOR_APPROXIMATE_COUNT)
+        return paginator.page(request.GET.get("cursor"))
+    return Paginator(queryset, per_page=per_page).get_page(request.GET.get("page"))
+
+
+async def apaginate(request, queryset, per_page, ordering=("pk",)):
+    # paginate() async rodiniams: puslapio įrašai ir COUNT įvykdomi čia, o ne šablone
+    queryset = queryset.order_by(*ordering)
+    if settings.LIBRARY_CURSOR_PAGINATION:
+        paginator = CursorPaginator(queryset, per_page, ordering,
+                                    approximate_count=settings.LIBRARY_CURSOR_APPROXIMATE_COUNT)
+        return await paginator.apage(request.GET.get("cursor"))
+    paginator = Paginator(queryset, per_page=per_page)
+    paginator.count = await queryset.acount()
+    try:
+        number = paginator.validate_number(request.GET.get("page") or 1)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+    bottom = (number - 1) * per_page
+    return Page([obj async for obj in queryset[bottom:bottom + per_page]], number, paginator)
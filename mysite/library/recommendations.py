@@ -0,0 +1,142 @@
+import math
+from collections import Counter, defaultdict
+from heapq import heappush, heappushpop, nlargest
+from itertools import groupby, islice
+from operator import itemgetter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from .models import Book, BookInstance, BookRecommendation, Loan
+
+# "Panašios knygos" skaičiuojamos iš anksto (manage.py build_recommendations).
+# Panašumas - bendri skaitytojai (kosinusas) ir žanrų sutapimas (Jaccard), t. y.
+# retųjų matricų sandauga A·Aᵀ, skaičiuojama po vieną eilutę per atvirkštinius
+# indeksus. Knygos su vienodu žanrų rinkiniu sugrupuojamos, todėl populiarus
+# žanras nesukuria milijonų porų, o skaitytojų ir knygų sąrašai apkarpomi iki
+# MAX_READERS ir MAX_BASKET naujausių, kad atmintis ir darbas būtų riboti.
+
+BORROW_WEIGHT = 0.7
+GENRE_WEIGHT = 0.3
+MAX_BASKET = 200
+MAX_READERS = 500
+SIGNATURE_NEIGHBOURS = 20
+CHUNK_SIZE = 10_000
+INSERT = (f"INSERT INTO {BookRecommendation._meta.db_table} (book_id, related_id, rank, score) "
+          f"VALUES (%s, %s, %s, %s)")
+
+
+class Engine:
+    def __init__(self, top=None):
+        self.top = top or settings.LIBRARY_RECOMMENDATIONS
+        self.baskets = defaultdict(set)     # skaitytojas -> knygos
+        self.readers = defaultdict(set)     # knyga -> skaitytojai
+        self.signatures = {}                # žanrų rinkinys -> nr.
+        self.genre_sets = {}                # nr. -> žanrų rinkinys
+        self.signature_of = {}              # knyga -> žanrų rinkinio nr.
+        self.popular = defaultdict(list)    # nr. -> populiariausių knygų heap'as (skaitytojų sk., -pk)
+        self.neighbours = {}                # nr. -> [(Jaccard, kito rinkinio nr.)]
+
+    def load(self):
+        self.load_borrowing()
+        self.load_genres()
+        self.link_signatures()
+        return self
+
+    def add_borrow(self, reader, book):
+        basket, readers = self.baskets[reader], self.readers[book]
+        if len(basket) < MAX_BASKET and len(readers) < MAX_READERS:
+            basket.add(book)
+            readers.add(reader)
+
+    def load_borrowing(self):
+        # nuo naujausių: dabartiniai skaitytojai, tada išdavimų istorija
+        current = (BookInstance.objects.filter(reader__isnull=False, book__isnull=False)
+                   .order_by("-pk").values_list("reader_id", "book_id"))
+        history = (Loan.objects.filter(reader__isnull=False, instance__book__isnull=False)
+                   .order_by("-pk").values_list("reader_id", "instance__book_id"))
+        for rows in (current, history):
+            for reader, book in rows.iterator(chunk_size=CHUNK_SIZE):
+                self.add_borrow(reader, book)
+
+    def load_genres(self):
+        rows = Book.genre.through.objects.order_by("book_id", "genre_id").values_list("book_id", "genre_id")
+        for book, genres in groupby(rows.iterator(chunk_size=CHUNK_SIZE), key=itemgetter(0)):
+            genres = frozenset(genre for _, genre in genres)
+            signature = self.signatures.setdefault(genres, len(self.signatures))
+            self.genre_sets[signature] = genres
+            self.signature_of[book] = signature
+            # kiekvienam rinkiniui laikoma top + 1 populiariausia knyga (viena gali būti pati knyga)
+            heap, entry = self.popular[signature], (len(self.readers.get(book, ())), -book)
+            if len(heap) <= self.top:
+                heappush(heap, entry)
+            else:
+                heappushpop(heap, entry)
+
+    def link_signatures(self):
+        # Jaccard skaičiuojamas tik rinkiniams, turintiems bent vieną bendrą žanrą
+        by_genre = defaultdict(list)
+        for signature, genres in self.genre_sets.items():
+            for genre in genres:
+                by_genre[genre].append(signature)
+        for signature, genres in self.genre_sets.items():
+            others = {other for genre in genres for other in by_genre[genre]}
+            self.neighbours[signature] = nlargest(SIGNATURE_NEIGHBOURS,
+                                                  ((self.jaccard(signature, other), other) for other in others))
+
+    def jaccard(self, a, b):
+        if a is None or b is None:
+            return 0.0
+        if a == b:
+            return 1.0
+        x, y = self.genre_sets[a], self.genre_sets[b]
+        return len(x & y) / len(x | y)
+
+    def recommend(self, book):
+        # [(balas, knygos pk)] mažėjančia tvarka
+        readers = self.readers.get(book, ())
+        together = Counter()
+        for reader in readers:
+            together.update(self.baskets[reader])
+        signature = self.signature_of.get(book)
+        candidates = set(together)
+        for _, other_signature in self.neighbours.get(signature, ()):
+            candidates.update(-entry[1] for entry in self.popular[other_signature])
+        candidates.discard(book)
+
+        def score(other):
+            borrowed = together[other] / math.sqrt(len(readers) * len(self.readers[other])) if together[other] else 0.0
+            return BORROW_WEIGHT * borrowed + GENRE_WEIGHT * self.jaccard(signature, self.signature_of.get(other))
+        return nlargest(self.top, ((score(other), other) for other in candidates), key=lambda row: (row[0], -row[1]))
+
+    def affected_books(self, since):
+        # knygos, kurių išdavimai ar jų skaitytojų krepšeliai pasikeitė nuo since, ir knygos be rekomendacijų
+        books = set()
+        recent = Loan.objects.filter(date_out__date__gte=since, reader__isnull=False, instance__book__isnull=False)
+        for reader, book in recent.values_list("reader_id", "instance__book_id").iterator(chunk_size=CHUNK_SIZE):
+            books.add(book)
+            books.update(self.baskets.get(reader, ()))
+        missing = Book.objects.filter(~Exists(BookRecommendation.objects.filter(book=OuterRef("pk"))))
+        books.update(missing.values_list("pk", flat=True).iterator(chunk_size=CHUNK_SIZE))
+        return sorted(books)
+
+    def build(self, books, batch_size=1000):
+        # įrašai keičiami paketais trumpomis transakcijomis; grąžina apdorotų knygų skaičių po kiekvieno paketo.
+        # Eilutės įrašomos executemany be modelių objektų - milijonams eilučių tai kelis kartus greičiau.
+        books, total = iter(books), 0
+        while batch := list(islice(books, batch_size)):
+            rows = [(book, other, rank, round(score, 4))
+                    for book in batch for rank, (score, other) in enumerate(self.recommend(book), 1)]
+            with transaction.atomic():
+                BookRecommendation.objects.filter(book_id__in=batch).delete()
+                with connection.cursor() as cursor:
+                    cursor.executemany(INSERT, rows)
+            total += len(batch)
+            yield total
+
+
+def all_books():
+    # pk paketais pagal raktą, kad skaitymo kursorius neliktų atviras rašant rekomendacijas
+    last = 0
+    while pks := list(Book.objects.filter(pk__gt=last).order_by("pk").values_list("pk", flat=True)[:CHUNK_SIZE]):
+        yield from pks
+        last = pks[-1]
@@ -0,0 +1,77 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Skaitymas iš replikų katalogo peržiūrai. ReplicaMiddleware pažymi GET užklausas
+# į LIBRARY_REPLICA_VIEWS, o ReplicaRouter tada library modelius skaito iš atsitiktinės
+# replikos. Rašymas, sesijos ir naudotojai visada eina į pagrindinę duomenų bazę.
+# Po POST naršyklė kelioms sekundėms "prisegama" prie pagrindinės bazės (slapukas),
+# kad naudotojas iškart matytų savo pakeitimus, net jei replika dar atsilieka.
+# Kešas (fragmentai) ir skaitliukai pildomi tik iš pagrindinės bazės: atsiliekančios replikos
+# duomenys išliktų keše ar skaitliukų lentelėje ilgiau nei pati replikos delsa.
+
+PIN_COOKIE = "library_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+replica_reads = ContextVar("library_replica_reads", default=False)
+
+
+@contextmanager
+def reading_from_replica():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+@contextmanager
+def reading_from_primary():
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.LIBRARY_REPLICAS and model._meta.app_label == "library":
+            return random.choice(settings.LIBRARY_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replikos yra pagrindinės bazės kopijos
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.LIBRARY_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not settings.LIBRARY_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token:
+                replica_reads.reset(request.replica_token)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, "1", max_age=settings.LIBRARY_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite="Lax")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+                and request.resolver_match.url_name in settings.LIBRARY_REPLICA_VIEWS):
+            request.replica_token = replica_reads.set(True)
@@ -0,0 +1,197 @@
+import re
+import unicodedata
+from django.db import connection
+
+# Pilno teksto paieškos indeksas. Knygos ir autoriai indeksuojami atskirose
+# lentelėse, kurių eilutės id sutampa su objekto pk, todėl atnaujinimas ir
+# trynimas yra vienas paieškos pagal raktą veiksmas.
+
+BOOK_TABLE = "library_book_search"
+AUTHOR_TABLE = "library_author_search"
+
+COLUMNS = {
+    BOOK_TABLE: ("title", "authors", "summary"),
+    AUTHOR_TABLE: ("name",),
+}
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    # "Žemaitė" -> "zemaite": diakritikai nuimami tiek indeksuojant, tiek ieškant
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def terms(query):
+    return WORD_RE.findall(normalize(query))
+
+
+class SqliteBackend:
+    def create(self, cursor):
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {BOOK_TABLE} "
+                       f"USING fts5(title, authors, summary, tokenize='unicode61 remove_diacritics 2')")
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {AUTHOR_TABLE} "
+                       f"USING fts5(name, tokenize='unicode61 remove_diacritics 2')")
+
+    def upsert(self, cursor, table, rows):
+        cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+        columns = ", ".join(COLUMNS[table])
+        placeholders = ", ".join(["%s"] * len(rows[0]))
+        cursor.executemany(f"INSERT INTO {table} (rowid, {columns}) VALUES ({placeholders})", rows)
+
+    def delete(self, cursor, table, pk):
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+
+    def match(self, query):
+        # kiekvienas žodis - prefiksas, kad paieška veiktų ir su nebaigtu žodžiu
+        return " ".join(f'"{term}"*' for term in terms(query))
+
+    def search(self, cursor, table, query, offset, limit):
+        weights = "10.0, 5.0, 1.0" if table == BOOK_TABLE else "1.0"
+        cursor.execute(f"SELECT rowid FROM {table} WHERE {table} MATCH %s "
+                       f"ORDER BY bm25({table}, {weights}) LIMIT %s OFFSET %s",
+                       [self.match(query), limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+    def count(self, cursor, table, query):
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {table} MATCH %s", [self.match(query)])
+        return cursor.fetchone()[0]
+
+
+class PostgresBackend:
+    # tsvector lentelės su GIN indeksais; diakritikus nuima unaccent plėtinys
+    def create(self, cursor):
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        for table in (BOOK_TABLE, AUTHOR_TABLE):
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                           f"(id bigint PRIMARY KEY, document tsvector NOT NULL)")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_document "
+                           f"ON {table} USING gin (document)")
+
+    def document(self, table):
+        if table == BOOK_TABLE:
+            return ("setweight(to_tsvector('simple', unaccent(%s)), 'A') || "
+                    "setweight(to_tsvector('simple', unaccent(%s)), 'B') || "
+                    "setweight(to_tsvector('simple', unaccent(%s)), 'D')")
+        return "to_tsvector('simple', unaccent(%s))"
+
+    def upsert(self, cursor, table, rows):
+        cursor.executemany(f"INSERT INTO {table} (id, document) VALUES (%s, {self.document(table)}) "
+                           f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document", rows)
+
+    def delete(self, cursor, table, pk):
+        cursor.execute(f"DELETE FROM {table} WHERE id = %s", [pk])
+
+    def match(self, query):
+        return " & ".join(f"{term}:*" for term in terms(query))
+
+    def search(self, cursor, table, query, offset, limit):
+        cursor.execute(f"SELECT id FROM {table} WHERE document @@ to_tsquery('simple', %s) "
+                       f"ORDER BY ts_rank_cd(document, to_tsquery('simple', %s)) DESC, id "
+                       f"LIMIT %s OFFSET %s",
+                       [self.match(query), self.match(query), limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+    def count(self, cursor, table, query):
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE document @@ to_tsquery('simple', %s)",
+                       [self.match(query)])
+        return cursor.fetchone()[0]
+
+
+BACKENDS = {
+    "sqlite": SqliteBackend(),
+    "postgresql": PostgresBackend(),
+}
+
+
+def get_backend(using=None):
+    return BACKENDS.get((using or connection).vendor)
+
+
+def create_index(using=None):
+    using = using or connection
+    backend = get_backend(using)
+    if backend:
+        with using.cursor() as cursor:
+            backend.create(cursor)
+
+
+def clear():
+    if get_backend():
+        with connection.cursor() as cursor:
+            for table in (BOOK_TABLE, AUTHOR_TABLE):
+                cursor.execute(f"DELETE FROM {table}")
+
+
+def book_row(book):
+    authors = str(book.author) if book.author else ""
+    return book.pk, book.title, authors, book.summary
+
+
+def index_books(books):
+    backend = get_backend()
+    rows = [book_row(book) for book in books]
+    if backend and rows:
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, BOOK_TABLE, rows)
+
+
+def index_authors(authors):
+    backend = get_backend()
+    rows = [(author.pk, str(author)) for author in authors]
+    if backend and rows:
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, AUTHOR_TABLE, rows)
+
+
+def remove_book(pk):
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.delete(cursor, BOOK_TABLE, pk)
+
+
+def remove_author(pk):
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.delete(cursor, AUTHOR_TABLE, pk)
+
+
+class SearchResults:
+    # Paginator'iui tinkama seka: count() ir pjūviai vykdomi indekse,
+    # o modeliai užkraunami tik rodomam puslapiui ir išlaiko reitingo tvarką.
+    def __init__(self, queryset, table, query):
+        self.queryset = queryset
+        self.table = table
+        self.query = query
+        self.backend = get_backend()
+
+    def count(self):
+        if not self.backend or not terms(self.query):
+            return 0
+        with connection.cursor() as cursor:
+            return self.backend.count(cursor, self.table, self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        if not self.backend or not terms(self.query):
+            return []
+        offset = item.start or 0
+        with connection.cursor() as cursor:
+            pks = self.backend.search(cursor, self.table, self.query, offset, item.stop - offset)
+        objects = self.queryset.in_bulk(pks)
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+def search_books(queryset, query):
+    return SearchResults(queryset, BOOK_TABLE, query)
+
+
+def search_authors(queryset, query):
+    return SearchResults(queryset, AUTHOR_TABLE, query)
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save  # signalas (būna įvairių)
+from django.db.models.signals import (post_save, post_delete, pre_save, pre_delete,  # signalas (būna įvairių)
+                                      post_migrate, m2m_changed)
 from django.contrib.auth.models import User     # siuntėjas
+from django.db import connections
+from django.db.models import F
 from django.dispatch import receiver            # priėmėjas (dekoratorius)
-from .models import Profile
+from .models import Profile, Book, Author, BookInstance, BookReview, Genre
+from . import caching, counters, search, versions
 
 # Sukūrus vartotoją automatiškai sukuriamas ir profilis.
 @receiver(post_save, sender=User) # jeigu išsaugojamas User objektas, inicijuojama f-ja po dekoratoriumi
@@ -10,7 +14,192 @@ def create_profile(sender, instance, created, **kwargs): # instance yra ką tik
         Profile.objects.create(user=instance)
 
 
-# Pakoregavus vartotoją, išsaugomas ir profilis
-@receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+# Paieškos indeksas sukuriamas po migracijų ir atnaujinamas keičiant knygas bei autorius
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    if sender.name == "library":
+        search.create_index(connections[using])
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    search.index_books([instance])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    search.remove_book(instance.pk)
+
+
+# Ištrynus knygą ar profilį, ištrinamos ir jų paveikslėlių versijos
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Profile)
+def evict_renditions(sender, instance, **kwargs):
+    for name, (hash_field, widths, square) in instance.renditions.items():
+        if getattr(instance, hash_field):
+            instance.evict_renditions(name, getattr(instance, hash_field))
+
+
+@receiver(post_save, sender=Author)
+def index_author(sender, instance, **kwargs):
+    search.index_authors([instance])
+    search.index_books(instance.books.select_related("author"))
+
+
+@receiver(pre_delete, sender=Author)
+def remember_author_books(sender, instance, **kwargs):
+    instance._book_pks = list(instance.books.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Author)
+def unindex_author(sender, instance, **kwargs):
+    search.remove_author(instance.pk)
+    search.index_books(Book.objects.filter(pk__in=instance._book_pks))
+
+
+# Pagrindinio puslapio skaitliukai
+@receiver(post_save, sender=Book)
+def count_book(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(num_books=1)
+
+
+@receiver(post_delete, sender=Book)
+def uncount_book(sender, instance, **kwargs):
+    counters.adjust(num_books=-1)
+
+
+@receiver(post_save, sender=Author)
+def count_author(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(num_authors=1)
+
+
+@receiver(post_delete, sender=Author)
+def uncount_author(sender, instance, **kwargs):
+    counters.adjust(num_authors=-1)
+
+
+@receiver(pre_save, sender=BookInstance)
+def remember_instance_status(sender, instance, **kwargs):
+    instance._old_status = instance._old_book_id = None
+    if not instance._state.adding:
+        old = BookInstance.objects.filter(pk=instance.pk).values_list("status", "book_id").first()
+        instance._old_status, instance._old_book_id = old or (None, None)
+
+
+@receiver(post_save, sender=BookInstance)
+def count_instance(sender, instance, created, **kwargs):
+    available = int(instance.status == 'a') - int(instance._old_status == 'a')
+    counters.adjust(num_instances=int(created), num_instances_available=available)
+
+
+@receiver(post_delete, sender=BookInstance)
+def uncount_instance(sender, instance, **kwargs):
+    counters.adjust(num_instances=-1, num_instances_available=-int(instance.status == 'a'))
+
+
+# Šablonų fragmentų kešo invalidavimas
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book(sender, instance, **kwargs):
+    caching.invalidate("book_card", instance.pk)
+    caching.invalidate("book_info", instance.pk)
+    old_author_id = getattr(instance, "_loaded_values", {}).get("author_id")
+    caching.invalidate("author_books", instance.author_id, old_author_id)
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def invalidate_book_genres(sender, instance, reverse, pk_set, **kwargs):
+    if reverse:
+        caching.invalidate("book_info", *(pk_set or instance.book_set.values_list("pk", flat=True)))
+    else:
+        caching.invalidate("book_info", instance.pk)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def invalidate_genre(sender, instance, **kwargs):
+    caching.invalidate("book_info", *instance.book_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def invalidate_author(sender, instance, **kwargs):
+    caching.invalidate("author_bio", instance.pk)
+    caching.invalidate("author_books", instance.pk)
+    book_pks = getattr(instance, "_book_pks", None)
+    if book_pks is None:
+        book_pks = list(instance.books.values_list("pk", flat=True))
+    caching.invalidate("book_card", *book_pks)
+    caching.invalidate("book_info", *book_pks)
+
+
+@receiver(post_save, sender=BookReview)
+@receiver(post_delete, sender=BookReview)
+def invalidate_reviews(sender, instance, **kwargs):
+    caching.invalidate("book_reviews", instance.book_id, getattr(instance, "_old_book_id", None))
+
+
+@receiver(pre_save, sender=BookReview)
+def remember_review_book(sender, instance, **kwargs):
+    instance._old_book_id = None
+    if not instance._state.adding:
+        instance._old_book_id = BookReview.objects.filter(pk=instance.pk).values_list("book_id", flat=True).first()
+
+
+# Knygos atsiliepimų suvestinė: naujas atsiliepimas - vienas UPDATE su F(), kitais atvejais perskaičiuojama
+@receiver(post_save, sender=BookReview)
+def count_review(sender, instance, created, **kwargs):
+    if created:
+        Book.objects.filter(pk=instance.book_id).update(review_count=F("review_count") + 1,
+                                                        latest_review_at=instance.date_created)
+    elif instance._old_book_id != instance.book_id:
+        Book.objects.filter(pk__in=[instance.book_id, instance._old_book_id]).refresh_review_stats()
+
+
+@receiver(post_delete, sender=BookReview)
+def uncount_review(sender, instance, **kwargs):
+    Book.objects.filter(pk=instance.book_id).refresh_review_stats()
+
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def invalidate_instances(sender, instance, **kwargs):
+    # kortelėje rodomas ir laisvų egzempliorių skaičius
+    for name in ("book_instances", "book_card"):
+        caching.invalidate(name, instance.book_id, getattr(instance, "_old_book_id", None))
+
+
+@receiver(pre_save, sender=Profile)
+def remember_photo_change(sender, instance, **kwargs):
+    instance._photo_changed = getattr(instance, "_loaded_values", {}).get("photo_hash", "") != instance.photo_hash
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_reviewer(sender, instance, **kwargs):
+    # recenzijose rodoma recenzento nuotrauka
+    if instance._photo_changed:
+        book_pks = BookReview.objects.filter(reviewer_id=instance.user_id).values_list("book_id", flat=True)
+        caching.invalidate("book_reviews", *set(book_pks))
+
+
+VERSIONED = {Book: "book", Author: "author", Genre: "genre", BookInstance: "instance"}
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def touch_version(sender, instance, **kwargs):
+    versions.touch(VERSIONED[sender])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def touch_book_genres(sender, action, **kwargs):
+    if action.startswith("post_"):
+        versions.touch("book")
@@ -0,0 +1,43 @@
+import random
+import sqlite3
+import time
+
+# SQLite apkrovos darbininkas sqlite_benchmark komandai. Vykdomas atskirame procese
+# (kaip gunicorn workeris), todėl importuoja tik standartinę biblioteką.
+
+READ_SQL = ('SELECT b.id, b.title, a.first_name, a.last_name FROM library_book b '
+            'LEFT JOIN library_author a ON a.id = b.author_id ORDER BY b.title, b.id LIMIT 20 OFFSET ?')
+COUNT_SQL = "SELECT COUNT(*) FROM library_bookreview WHERE book_id = ?"
+WRITE_SQL = ("INSERT INTO library_bookreview (book_id, reviewer_id, content, date_created) "
+             "VALUES (?, ?, 'Apkrovos testas', datetime('now'))")
+
+
+def worker(path, config, duration, write_ratio, seed):
+    # config: {"init": [PRAGMA...], "immediate": bool, "timeout": sekundės}
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path, timeout=config["timeout"], isolation_level=None)
+    for statement in config["init"]:
+        connection.execute(statement)
+    max_book, = connection.execute("SELECT MAX(id) FROM library_book").fetchone()
+    reviewer, = connection.execute("SELECT MIN(id) FROM auth_user").fetchone()
+    reads = writes = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                # skaitymas ir rašymas vienoje transakcijoje, kaip atsiliepimo ar išdavimo atveju
+                connection.execute("BEGIN IMMEDIATE" if config["immediate"] else "BEGIN")
+                book = rng.randint(1, max_book)
+                connection.execute(COUNT_SQL, (book,)).fetchone()
+                connection.execute(WRITE_SQL, (book, reviewer))
+                connection.execute("COMMIT")
+                writes += 1
+            else:
+                connection.execute(READ_SQL, (rng.randint(0, 50) * 20,)).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+    connection.close()
+    return reads, writes, errors
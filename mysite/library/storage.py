@@ -0,0 +1,47 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# collectstatic saugykla produkcijai: failų vardai su turinio hash'u (ManifestStaticFilesStorage)
+# ir šalia - iš anksto suspausti .gz bei .br (jei įdiegtas brotli) variantai, kuriuos
+# library.views.static_file atiduoda pagal Accept-Encoding, nespausdama kiekvienos užklausos.
+
+COMPRESSIBLE = (".css", ".js", ".mjs", ".map", ".svg", ".html", ".txt", ".json", ".xml", ".ico", ".ttf", ".eot")
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+# mažesnius failus suspaudus laimima mažiau nei kainuoja papildomas failas
+MIN_SIZE = 256
+
+
+def compressors():
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, *args, **kwargs):
+        for name, hashed_name, processed in super().post_process(*args, **kwargs):
+            if hashed_name and not isinstance(processed, Exception):
+                self.compress(name)
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < MIN_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            # suspaustas failas paliekamas tik jei jis iš tikrųjų mažesnis
+            if len(compressed) < len(data) * 0.95:
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,26 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.db import transaction
+
+# Sunkūs darbai (paveikslėlių apdorojimas) vykdomi atskirų procesų telkinyje,
+# kad neužlaikytų užklausos. Užduotis pateikiama tik po sėkmingo COMMIT.
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.LIBRARY_TASK_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def submit(func, *args):
+    def run():
+        if settings.LIBRARY_TASKS_EAGER:
+            func(*args)
+        else:
+            get_executor().submit(func, *args)
+    transaction.on_commit(run)
@@ -0,0 +1,58 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+from library import caching, routers
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendition(obj, name, width, fmt="webp"):
+    return obj.rendition_url(name, width, fmt)
+
+
+@register.simple_tag
+def responsive_image(obj, name, sizes, **attrs):
+    # <picture> su WebP ir JPEG srcset; naršyklė pati renkasi reikiamą dydį
+    widths = obj.renditions[name][1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        obj.rendition_srcset(name, "webp"), sizes,
+        obj.rendition_url(name, widths[len(widths) // 2], "jpg"), obj.rendition_srcset(name, "jpg"), sizes,
+        format_html_join("", ' {}="{}"', attrs.items()),
+    )
+
+
+@register.simple_tag
+def elided_page_range(page):
+    return page.paginator.get_elided_page_range(page.number)
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        html = caching.get_fragment(self.name, *vary_on)
+        if html is None:
+            with routers.reading_from_primary():
+                html = self.nodelist.render(context)
+            caching.set_fragment(html, self.name, *vary_on)
+        return html
+
+
+@register.tag
+def cachedfragment(parser, token):
+    # {% cachedfragment "book_card" book.pk %}...{% endcachedfragment %}
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name and at least one key")
+    nodelist = parser.parse(("endcachedfragment",))
+    parser.delete_first_token()
+    name = bits[1].strip("\"'")
+    if name not in caching.FRAGMENTS:
+        raise template.TemplateSyntaxError(f"Unknown fragment '{name}'")
+    return FragmentNode(nodelist, name, [parser.compile_filter(bit) for bit in bits[2:]])
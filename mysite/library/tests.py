@@ -1,3 +1,1358 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock, skipIf
+from unittest.mock import AsyncMock
+from PIL import Image
+from django import template
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from datetime import date, timedelta
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import Author, Book, BookInstance, BookRecommendation, BookReview, Genre, Hold, Loan, LoanReminder
+from . import async_views, benchmark, caching, counters, images, loans, recommendations, routers, search
+from . import sqliteload, urls as library_urls, views
+from .management.commands import sqlite_benchmark
 
-# Create your tests here.
+
+class LibraryTestCase(TestCase):
+    # replikos (LIBRARY_SQLITE_REPLICAS) testuose yra pagrindinės bazės veidrodžiai
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # ir naudoja tą pačią jungtį, kad matytų dar neįvykdytą (COMMIT) testo transakciją
+        for alias in settings.LIBRARY_REPLICAS:
+            connections[alias] = connections["default"]
+        super().setUpClass()
+
+    # kešas (skaitliukai, fragmentai) nėra transakcijos dalis, todėl valomas prieš kiekvieną testą
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class SearchTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = Author.objects.create(first_name="Žemaitė", last_name="Žymantienė")
+        self.book = Book.objects.create(title="Marti", summary="Apsakymas apie kaimo gyvenimą",
+                                        isbn="9786094660001", author=self.author)
+        Book.objects.create(title="Kita knyga", summary="Apie martį ir kaimą", isbn="9786094660002")
+
+    def search(self, query):
+        return self.client.get(reverse("search"), {"query": query})
+
+    def test_ranks_title_match_first(self):
+        response = self.search("mart")
+        self.assertEqual([book.title for book in response.context["books"]], ["Marti", "Kita knyga"])
+
+    def test_ignores_diacritics(self):
+        response = self.search("zemaite")
+        self.assertEqual(list(response.context["books"]), [self.book])
+        self.assertEqual(list(response.context["authors"]), [self.author])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.author.last_name = "Beniuševičiūtė"
+        self.author.save()
+        self.assertEqual(list(self.search("beniusev").context["books"]), [self.book])
+        self.book.delete()
+        self.assertEqual(list(self.search("beniusev").context["books"]), [])
+
+    def test_empty_query(self):
+        response = self.search("")
+        self.assertEqual(list(response.context["books"]), [])
+
+    def test_paginates(self):
+        Book.objects.bulk_create([Book(title=f"Marti {i}", summary="", isbn=str(i)) for i in range(25)])
+        search.index_books(Book.objects.select_related("author"))
+        response = self.client.get(reverse("search"), {"query": "marti", "books_page": 3})
+        self.assertEqual(response.context["books"].paginator.count, 27)
+        self.assertEqual(len(response.context["books"]), 7)
+        self.assertContains(response, "?query=marti&amp;books_page=2")
+
+    def test_lists_paginate_independently(self):
+        Author.objects.bulk_create([Author(first_name="Žemaitė", last_name=str(i)) for i in range(12)])
+        search.index_authors(Author.objects.all())
+        response = self.client.get(reverse("search"), {"query": "zemaite", "books_page": 5})
+        self.assertEqual(response.context["authors"].number, 1)
+        self.assertEqual(len(response.context["authors"]), 10)
+        response = self.client.get(reverse("search"), {"query": "zemaite", "authors_page": 2})
+        self.assertEqual(len(response.context["authors"]), 3)
+
+
+class QueryCountTests(LibraryTestCase):
+    # Užklausų skaičius puslapyje neturi priklausyti nuo atsiliepimų, žanrų ar egzempliorių kiekio.
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="skaitytojas", password="slaptazodis")
+        self.author = Author.objects.create(first_name="Jonas", last_name="Biliūnas")
+        self.book = self.add_book(0)
+
+    def add_book(self, i):
+        book = Book.objects.create(title=f"Knyga {i}", summary="", isbn=f"{i}", author=self.author)
+        book.genre.add(Genre.objects.create(name=f"Žanras {i}"))
+        BookInstance.objects.create(book=book, reader=self.user, status="t")
+        reviewer = User.objects.create_user(username=f"recenzentas{i}")
+        BookReview.objects.create(book=book, reviewer=reviewer, content="Gera knyga")
+        return book
+
+    def grow(self):
+        for i in range(1, 6):
+            self.add_book(i)
+            self.book.genre.add(Genre.objects.create(name=f"Papildomas {i}"))
+            BookInstance.objects.create(book=self.book, reader=self.user, status="t")
+            reviewer = User.objects.create_user(username=f"kitas{i}")
+            BookReview.objects.create(book=self.book, reviewer=reviewer, content="Puiki")
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        before = self.count_queries(url)
+        self.grow()
+        self.assertEqual(self.count_queries(url), before)
+
+    def test_books(self):
+        self.assertConstantQueries(reverse("books"))
+
+    def test_book_detail(self):
+        self.client.force_login(self.user)
+        self.assertConstantQueries(reverse("book", kwargs={"pk": self.book.pk}))
+
+    def test_author(self):
+        self.assertConstantQueries(reverse("author", kwargs={"author_id": self.author.pk}))
+
+    def test_my_books(self):
+        self.client.force_login(self.user)
+        self.assertConstantQueries(reverse("mybooks"))
+
+
+class CounterTests(LibraryTestCase):
+    def index_counters(self):
+        response = self.client.get(reverse("index"))
+        return {name: response.context[name] for name in counters.NAMES}
+
+    def test_index_runs_no_aggregate_queries(self):
+        self.client.get(reverse("index"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("index"))
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])
+
+    def test_signals_keep_counters_in_sync(self):
+        self.index_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            author = Author.objects.create(first_name="Vincas", last_name="Mykolaitis")
+            book = Book.objects.create(title="Altorių šešėly", summary="", isbn="1", author=author)
+            instance = BookInstance.objects.create(book=book)
+            BookInstance.objects.create(book=book, status="t")
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.status = "t"
+            instance.save()
+        self.assertEqual(self.index_counters(), counters.compute())
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.status = "a"
+            instance.save()
+            BookInstance.objects.exclude(pk=instance.pk).delete()
+            book.delete()
+        self.assertEqual(self.index_counters(), counters.compute())
+
+    def test_reconcile_fixes_drift(self):
+        self.index_counters()
+        Book.objects.bulk_create([Book(title="Be signalų", summary="", isbn="2")])
+        self.assertEqual(self.index_counters()["num_books"], 0)
+        counters.reconcile()
+        self.assertEqual(self.index_counters()["num_books"], 1)
+
+    def test_counters_survive_cache_clear(self):
+        self.index_counters()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("index"))
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])
+
+    def test_rolled_back_change_keeps_counters(self):
+        self.index_counters()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.create(title="Atšaukta", summary="", isbn="3")
+            Book.objects.create(title="Dublikatas", summary="", isbn="3")
+        self.assertEqual(self.index_counters()["num_books"], 0)
+        Book.objects.create(title="Metai", summary="", isbn="3")
+        self.assertEqual(self.index_counters()["num_books"], 1)
+
+    def test_reconcile_command(self):
+        Book.objects.bulk_create([Book(title="Be signalų", summary="", isbn="2")])
+        out = io.StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("num_books: 1", out.getvalue())
+
+def make_image(name="photo.png", size=(640, 480), color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class MediaTestMixin:
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings = override_settings(MEDIA_ROOT=media.name, LIBRARY_TASKS_EAGER=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class RenditionTests(MediaTestMixin, LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="fotografas")
+
+    def upload(self, image):
+        profile = self.user.profile
+        profile.photo = image
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        return profile
+
+    def test_generates_renditions_for_new_photo(self):
+        profile = self.upload(make_image())
+        path = os.path.join(self.media_root, images.rendition_name(profile.photo_hash, 30, True, "webp"))
+        with Image.open(path) as img:
+            self.assertEqual(img.size, (30, 30))
+        self.assertTrue(profile.rendition_url("photo", 300).endswith("/300-square.webp"))
+
+    def test_unchanged_photo_is_not_processed_again(self):
+        self.upload(make_image())
+        with mock.patch("library.models.images.generate") as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+                User.objects.get(pk=self.user.pk).profile.save()
+        generate.assert_not_called()
+
+    def test_login_does_not_save_profile(self):
+        self.user.set_password("slaptazodis")
+        self.user.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username="fotografas", password="slaptazodis"))
+        self.assertEqual([q["sql"] for q in queries if 'UPDATE "library_profile"' in q["sql"]], [])
+
+    def test_new_content_gets_new_hash(self):
+        first = self.upload(make_image()).photo_hash
+        second = self.upload(make_image(color="blue")).photo_hash
+        self.assertNotEqual(first, second)
+
+
+class CoverCacheTests(MediaTestMixin, LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book = Book(title="Anykščių šilelis", summary="", isbn="1", cover=make_image("cover.png"))
+        self.book.save()
+
+    def rendition_dir(self, content_hash):
+        return os.path.join(self.media_root, "renditions", content_hash)
+
+    def test_generates_rendition_on_first_request(self):
+        url = self.book.rendition_url("cover", 300)
+        self.assertFalse(os.path.exists(self.rendition_dir(self.book.cover_hash)))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, url.removeprefix("/media/"))))
+
+    def test_unknown_size_is_not_generated(self):
+        url = self.book.rendition_url("cover", 300).replace("/300.", "/301.")
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_books_page_emits_srcset(self):
+        response = self.client.get(reverse("books"))
+        self.assertContains(response, f"{self.book.rendition_url('cover', 600)} 600w")
+
+    def test_evicts_renditions_when_cover_changes_or_is_deleted(self):
+        old_hash = self.book.cover_hash
+        self.client.get(self.book.rendition_url("cover", 150))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.cover = make_image("new.png", color="green")
+            self.book.save()
+        self.assertFalse(os.path.exists(self.rendition_dir(old_hash)))
+        self.assertTrue(os.path.exists(self.rendition_dir(self.book.cover_hash)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assertFalse(os.path.exists(self.rendition_dir(old_hash)))
+
+
+    def test_backfill_hashes_for_existing_covers(self):
+        content_hash = self.book.cover_hash
+        Book.objects.bulk_create([Book(title=f"Be viršelio {i}", summary="", isbn=f"b{i}") for i in range(3)])
+        Book.objects.update(cover_hash="")
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rendition_url("cover", 300), self.book.cover.url)
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("backfill_renditions", "--batch-size", "1", stdout=out)
+        self.assertIn("book.cover_hash: 1", out.getvalue())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.cover_hash, content_hash)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root,
+                                                    images.rendition_name(content_hash, 300, False, "webp"))))
+
+class CursorPaginationTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        # vienodi pavadinimai tikrina, kad rūšiavimas pagal (title, pk) yra stabilus
+        Book.objects.bulk_create([Book(title=f"Knyga {i // 2}", summary="", isbn=str(i)) for i in range(10)])
+        self.expected = list(Book.objects.order_by("title", "pk"))
+
+    def get(self, **params):
+        return self.client.get(reverse("books"), params).context["page_obj"]
+
+    @override_settings(LIBRARY_CURSOR_PAGINATION=True)
+    def test_walks_forward_and_back(self):
+        pages = [self.get()]
+        while pages[-1].has_next():
+            pages.append(self.get(cursor=pages[-1].next_token))
+        self.assertEqual([book for page in pages for book in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+        back = self.get(cursor=pages[-1].previous_token)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    @override_settings(LIBRARY_CURSOR_PAGINATION=True)
+    def test_deep_page_runs_no_count_or_offset(self):
+        page = self.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.get(cursor=page.next_token)
+        self.assertFalse([q for q in queries if q["sql"].startswith("SELECT COUNT(") or "OFFSET" in q["sql"]])
+
+    @override_settings(LIBRARY_CURSOR_PAGINATION=True)
+    def test_tampered_token_starts_from_first_page(self):
+        self.assertEqual(list(self.get(cursor="netinkamas")), self.expected[:3])
+
+    def test_page_mode_is_default(self):
+        page = self.get(page=2)
+        self.assertEqual(list(page), self.expected[3:6])
+
+
+class InstanceListTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username="bibliotekininkas", is_staff=True)
+        self.reader = User.objects.create_user(username="skaitytojas")
+        self.book = Book.objects.create(title="Dievų miškas", summary="", isbn="1")
+        self.taken = BookInstance.objects.create(book=self.book, status="t", reader=self.reader,
+                                                 due_back="2026-01-10")
+        self.available = BookInstance.objects.create(book=self.book, status="a")
+        self.client.force_login(self.staff)
+
+    def get(self, **params):
+        return self.client.get(reverse("instances"), params)
+
+    def test_filters(self):
+        self.assertEqual(list(self.get(status="a").context["instances"]), [self.available])
+        self.assertEqual(list(self.get(reader="skaitytojas").context["instances"]), [self.taken])
+        self.assertEqual(list(self.get(due_back_from="2026-01-01", due_back_to="2026-01-31").context["instances"]),
+                         [self.taken])
+        self.assertEqual(len(self.get(book=self.book.pk).context["instances"]), 2)
+
+    def test_streams_csv_export(self):
+        response = self.get(export="csv", status="t")
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ["uuid,book__title,status,due_back,reader__username",
+                                 f"{self.taken.uuid},Dievų miškas,t,2026-01-10,skaitytojas"])
+
+    def test_streams_jsonl_export(self):
+        response = self.get(export="jsonl", status="a")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, [{"uuid": str(self.available.uuid), "book__title": "Dievų miškas",
+                                 "status": "a", "due_back": None, "reader__username": None}])
+
+    def test_requires_staff(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.get().status_code, 403)
+
+
+class QueryPlanTests(LibraryTestCase):
+    # Kiekviena puslapio užklausa su WHERE ar ORDER BY turi naudoti indeksą, o ne pilną lentelės peržiūrą.
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username="bibliotekininkas", is_staff=True)
+        author = Author.objects.create(first_name="Antanas", last_name="Vienuolis")
+        self.book = Book.objects.create(title="Paskenduolė", summary="", isbn="1", author=author)
+        self.book.genre.add(Genre.objects.create(name="Apysaka"))
+        BookInstance.objects.create(book=self.book, reader=self.staff, status="t", due_back="2026-01-10")
+        BookReview.objects.create(book=self.book, reviewer=self.staff, content="Gera")
+        self.client.force_login(self.staff)
+
+    def full_scans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        problems = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or ("WHERE" not in sql and "ORDER BY" not in sql):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for detail in (row[-1] for row in cursor.fetchall()):
+                    # FTS5 lentelės rūšiuoja tik rastus įrašus pagal reitingą
+                    full_scan = detail.startswith("SCAN") and " USING " not in detail and "WHERE" in sql
+                    temp_sort = detail.startswith("USE TEMP B-TREE") and "_search" not in sql
+                    if (full_scan and "VIRTUAL TABLE" not in detail) or temp_sort:
+                        problems.append(f"{detail}: {sql}")
+        return problems
+
+    def test_catalogue_pages(self):
+        for url in [reverse("index"), reverse("books"), reverse("book", kwargs={"pk": self.book.pk}),
+                    reverse("authors"), reverse("author", kwargs={"author_id": self.book.author_id}),
+                    reverse("mybooks")]:
+            self.assertEqual(self.full_scans(url), [], url)
+        self.assertEqual(self.full_scans(reverse("search"), {"query": "pask"}), [])
+        self.assertEqual(self.full_scans(reverse("instances"), {"status": "t"}), [])
+        self.assertEqual(self.full_scans(reverse("books"), {"available": 1}), [])
+
+
+class LoanReminderTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        self.reader = User.objects.create_user(username="skaitytojas", email="skaitytojas@example.com")
+        book = Book.objects.create(title="Sename dvare", summary="", isbn="1")
+        self.overdue = BookInstance.objects.create(book=book, reader=self.reader, status="t",
+                                                   due_back=today - timedelta(days=2))
+        self.soon = BookInstance.objects.create(book=book, reader=self.reader, status="t",
+                                                due_back=today + timedelta(days=1))
+        BookInstance.objects.create(book=book, reader=self.reader, status="t", due_back=today + timedelta(days=30))
+        no_email = User.objects.create_user(username="be_pasto")
+        BookInstance.objects.create(book=book, reader=no_email, status="t", due_back=today)
+
+    def send(self):
+        call_command("send_loan_reminders", days=3, stdout=io.StringIO())
+
+    def test_groups_loans_per_reader(self):
+        self.send()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["skaitytojas@example.com"])
+        self.assertIn("vėluoja", mail.outbox[0].body)
+        self.assertEqual(set(LoanReminder.objects.values_list("instance_id", "kind")),
+                         {(self.overdue.pk, "o"), (self.soon.pk, "s")})
+
+    def test_rerun_is_idempotent(self):
+        self.send()
+        self.send()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_new_due_date_gets_new_reminder(self):
+        self.send()
+        self.soon.due_back = date.today() - timedelta(days=1)
+        self.soon.save()
+        self.send()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertNotIn("Sename dvare (vėluoja " + str(self.overdue.due_back), mail.outbox[1].body)
+
+
+class FragmentCacheTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reviewer = User.objects.create_user(username="recenzentas")
+        self.author = Author.objects.create(first_name="Ieva", last_name="Simonaitytė",
+                                            description="<p>Rašytoja</p>")
+        self.book = Book.objects.create(title="Aukštujų Šimonių likimas", summary="", isbn="1", author=self.author)
+        self.url = reverse("book", kwargs={"pk": self.book.pk})
+
+    @override_settings(LIBRARY_FRAGMENT_STATS=True)
+    def test_fragments_are_reused(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        caching.flush_stats()
+        self.assertEqual(caching.stats()["book_reviews"], {"hit": 1, "miss": 1})
+
+    def test_review_invalidates_only_its_book(self):
+        other = Book.objects.create(title="Vilius Karalius", summary="", isbn="2", author=self.author)
+        self.client.get(self.url)
+        self.client.get(reverse("book", kwargs={"pk": other.pk}))
+        with self.captureOnCommitCallbacks(execute=True):
+            BookReview.objects.create(book=self.book, reviewer=self.reviewer, content="Nauja recenzija")
+        self.assertIsNone(cache.get(caching.fragment_key("book_reviews", self.book.pk)))
+        self.assertIsNotNone(cache.get(caching.fragment_key("book_reviews", other.pk)))
+        self.assertContains(self.client.get(self.url), "Nauja recenzija")
+
+    @override_settings(LIBRARY_FRAGMENT_STATS=True)
+    def test_stats_command_needs_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, "LIBRARY_CACHE_URL"):
+            call_command("fragment_cache_stats", stdout=io.StringIO())
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "library_cache"}}
+        with override_settings(CACHES=shared):
+            call_command("createcachetable", verbosity=0)
+            with mock.patch("library.caching.STATS_FLUSH_EVERY", 1):
+                self.client.get(self.url)
+            out = io.StringIO()
+            call_command("fragment_cache_stats", stdout=out)
+        self.assertRegex(out.getvalue(), r"book_reviews\s+hit\s+0\s+miss\s+1")
+
+    def test_warm_pages_do_not_write_cache(self):
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "library_cache"}}
+        with override_settings(CACHES=shared):
+            call_command("createcachetable", verbosity=0)
+            self.client.get(reverse("books"))
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("books"))
+        self.assertEqual([q["sql"] for q in queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))], [])
+
+    def test_cached_author_books_skip_query(self):
+        url = reverse("author", kwargs={"author_id": self.author.pk})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.client.get(url), "Aukštujų Šimonių likimas")
+        self.assertEqual([q["sql"] for q in queries if 'FROM "library_book"' in q["sql"]], [])
+
+    def test_author_change_invalidates_book_and_author_pages(self):
+        self.client.get(reverse("books"))
+        self.client.get(reverse("author", kwargs={"author_id": self.author.pk}))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.last_name = "Simonaitytė-Ramonienė"
+            self.author.save()
+        self.assertContains(self.client.get(reverse("books")), "Simonaitytė-Ramonienė")
+        self.assertContains(self.client.get(reverse("author", kwargs={"author_id": self.author.pk})),
+                            "Simonaitytė-Ramonienė")
+
+    def test_instance_change_invalidates_instances(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            BookInstance.objects.create(book=self.book, status="r")
+        self.assertContains(self.client.get(self.url), "text-warning")
+
+
+class AdminChangelistTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="administratorius", password="slaptazodis")
+        self.client.force_login(self.admin)
+        self.add_rows(1)
+
+    def add_rows(self, n):
+        for i in range(n):
+            author = Author.objects.create(first_name="Autorius", last_name=str(i))
+            book = Book.objects.create(title=f"Knyga {i}", summary="", isbn=f"{n}-{i}", author=author)
+            book.genre.add(Genre.objects.create(name=f"Žanras {i}"), Genre.objects.create(name=f"Kitas {i}"))
+            BookInstance.objects.create(book=book, reader=self.admin, status="t")
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        urls = [reverse(f"admin:library_{model}_changelist") for model in ("author", "book", "bookinstance")]
+        before = [self.count_queries(url) for url in urls]
+        self.add_rows(10)
+        self.assertEqual([self.count_queries(url) for url in urls], before)
+
+    def test_instance_search(self):
+        instance = BookInstance.objects.first()
+        url = reverse("admin:library_bookinstance_changelist")
+        self.assertContains(self.client.get(url, {"q": str(instance.uuid)}), str(instance.uuid))
+        self.assertEqual(self.client.get(url, {"q": "Knyga"}).status_code, 200)
+
+
+class CatalogueTests(LibraryTestCase):
+    rows = [
+        {"isbn": "9786090100001", "title": "Altorių šešėly", "summary": "Romanas", "author_first_name": "Vincas",
+         "author_last_name": "Mykolaitis-Putinas", "genres": ["Romanas", "Klasika"], "copies": 2},
+        {"isbn": "9786090100002", "title": "Baltaragio malūnas", "summary": "Apysaka", "author_first_name": "Kazys",
+         "author_last_name": "Boruta", "genres": ["Klasika"], "copies": 1},
+    ]
+
+    def import_file(self, name, content, *args):
+        path = os.path.join(tempfile.mkdtemp(), name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        call_command("import_catalogue", path, *args, stdout=io.StringIO())
+
+    def jsonl(self, rows):
+        return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+    def test_import_jsonl(self):
+        self.import_file("katalogas.jsonl", self.jsonl(self.rows), "--batch-size", "1")
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Genre.objects.count(), 2)
+        book = Book.objects.get(isbn="9786090100001")
+        self.assertEqual(str(book.author), "Vincas Mykolaitis-Putinas")
+        self.assertEqual(sorted(genre.name for genre in book.genre.all()), ["Klasika", "Romanas"])
+        self.assertEqual(book.instances.count(), 2)
+        self.assertEqual([b.pk for b in search.search_books(Book.objects.all(), "sesely")[:10]], [book.pk])
+        self.assertEqual(counters.get_counters()["num_instances"], 3)
+
+    def test_reimport_updates_without_duplicates(self):
+        self.import_file("katalogas.jsonl", self.jsonl(self.rows))
+        changed = [{**self.rows[0], "title": "Altorių šešėly (2 leidimas)", "copies": 3}, self.rows[1]]
+        self.import_file("katalogas.jsonl", self.jsonl(changed))
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Author.objects.count(), 2)
+        book = Book.objects.get(isbn="9786090100001")
+        self.assertEqual(book.title, "Altorių šešėly (2 leidimas)")
+        self.assertEqual(book.instances.count(), 3)
+
+    def test_reimport_invalidates_instances_and_author_books(self):
+        self.import_file("katalogas.jsonl", self.jsonl(self.rows))
+        book = Book.objects.get(isbn="9786090100001")
+        book_url = reverse("book", kwargs={"pk": book.pk})
+        author_url = reverse("author", kwargs={"author_id": book.author_id})
+        self.client.get(book_url)
+        self.client.get(author_url)
+        again = [{**self.rows[0], "copies": 3}, {**self.rows[0], "isbn": "9786090100003", "title": "Sukilėliai"}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_file("katalogas.jsonl", self.jsonl(again))
+        page = self.client.get(book_url)
+        for instance in book.instances.all():
+            self.assertContains(page, instance.uuid)
+        self.assertContains(self.client.get(author_url), "Sukilėliai")
+
+    def test_key_cache_reset_keeps_batch_keys(self):
+        # antrame pakete pakartotas autorius ir žanras turi būti rasti ir po žodyno išvalymo
+        self.import_file("katalogas.jsonl", self.jsonl(self.rows))
+        again = [{**self.rows[0], "isbn": "9786090100003", "title": "Sukilėliai"}, self.rows[1]]
+        with mock.patch("library.catalogue.KEY_CACHE_SIZE", 1):
+            self.import_file("katalogas.jsonl", self.jsonl(self.rows + again), "--batch-size", "2")
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertFalse(Book.objects.filter(author__isnull=True).exists())
+        self.assertEqual(sorted(Book.objects.get(isbn="9786090100003").genre.values_list("name", flat=True)),
+                         ["Klasika", "Romanas"])
+
+    def test_export_round_trip_csv(self):
+        self.import_file("katalogas.jsonl", self.jsonl(self.rows))
+        out = io.StringIO()
+        call_command("export_catalogue", "--format", "csv", stdout=out)
+        self.assertIn("Klasika;Romanas", out.getvalue().replace("Romanas;Klasika", "Klasika;Romanas"))
+        Book.objects.all().delete()
+        self.import_file("katalogas.csv", out.getvalue())
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Book.objects.get(isbn="9786090100002").genre.get().name, "Klasika")
+
+
+class LoanTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create_user(username="skaitytojas", password="slaptazodis")
+        self.other = User.objects.create_user(username="kitas", password="slaptazodis")
+        self.instance = BookInstance.objects.create(book=Book.objects.create(title="Metai", summary="", isbn="1"))
+
+    def test_checkout_and_checkin_record_history(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            loans.checkout(self.instance, self.reader)
+        self.instance.refresh_from_db()
+        self.assertEqual((self.instance.status, self.instance.reader), ('t', self.reader))
+        self.assertEqual(counters.get_counters()["num_instances_available"], 0)
+        with self.assertRaises(loans.LoanError):
+            loans.checkout(BookInstance.objects.get(pk=self.instance.pk), self.other)
+        loans.checkin(self.instance)
+        loan = Loan.objects.get()
+        self.assertEqual(loan.reader, self.reader)
+        self.assertIsNotNone(loan.date_returned)
+        self.assertEqual(BookInstance.objects.get().status, 'a')
+
+    def test_reservation_is_kept_for_its_reader(self):
+        loans.reserve(self.instance, self.reader)
+        with self.assertRaises(loans.LoanError):
+            loans.checkout(self.instance, self.other)
+        loans.checkout(self.instance, self.reader)
+        self.assertEqual(BookInstance.objects.get().status, 't')
+
+    def test_checkout_needs_reader(self):
+        with self.assertRaises(loans.LoanError):
+            loans.checkout(self.instance, None)
+        staff = User.objects.create_user(username="bibliotekininkas", password="slaptazodis", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("instances_action", kwargs={"pk": self.instance.pk, "action": "checkout"})
+        self.assertEqual(self.client.post(url).status_code, 409)
+        self.assertEqual(BookInstance.objects.get().status, 'a')
+        self.assertFalse(Loan.objects.exists())
+
+    def test_renew_only_by_borrower(self):
+        loans.checkout(self.instance, self.reader, due_back=date.today())
+        with self.assertRaises(loans.LoanError):
+            loans.renew(self.instance, self.other)
+        loans.renew(self.instance, self.reader)
+        self.assertEqual(Loan.objects.get().due_back, date.today() + timedelta(days=14))
+
+    def test_update_form_rejects_stale_status(self):
+        staff = User.objects.create_user(username="bibliotekininkas", password="slaptazodis", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("instances_update", kwargs={"pk": self.instance.pk})
+        data = {"book": self.instance.book_id, "status": "t", "reader": self.other.pk,
+                "due_back": "2030-01-01", "expected_status": "a"}
+        loans.checkout(self.instance, self.reader)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BookInstance.objects.get().reader, self.reader)
+        self.client.post(reverse("instances_action", kwargs={"pk": self.instance.pk, "action": "checkin"}))
+        self.assertRedirects(self.client.post(url, data), reverse("instance", kwargs={"pk": self.instance.pk}))
+        self.assertEqual(BookInstance.objects.get().reader, self.other)
+        self.assertEqual(Loan.objects.filter(date_returned__isnull=True).get().reader, self.other)
+
+
+    def test_admin_rejects_stale_status(self):
+        admin = User.objects.create_superuser(username="administratorius", password="slaptazodis")
+        self.client.force_login(admin)
+        url = reverse("admin:library_bookinstance_change", args=[self.instance.pk])
+        self.assertContains(self.client.get(url), 'name="expected_status" value="a"')
+        data = {"uuid": self.instance.uuid, "book": self.instance.book_id, "status": "t", "reader": self.other.pk,
+                "due_back": "2030-01-01", "expected_status": "a"}
+        loans.checkout(self.instance, self.reader)
+        response = self.client.post(url, data, follow=True)
+        self.assertRedirects(response, url)
+        self.assertEqual([m.level for m in response.context["messages"]], [messages.ERROR])
+        self.assertEqual(BookInstance.objects.get().reader, self.reader)
+        self.assertEqual(Loan.objects.get().reader, self.reader)
+
+        changelist = reverse("admin:library_bookinstance_changelist")
+        self.assertContains(self.client.get(changelist), 'name="form-0-expected_status" value="t"')
+        rows = {"form-TOTAL_FORMS": 1, "form-INITIAL_FORMS": 1, "form-0-id": self.instance.pk,
+                "form-0-due_back": "", "form-0-status": "a", "form-0-expected_status": "a", "_save": "Save"}
+        response = self.client.post(changelist, rows, follow=True)
+        self.assertEqual([m.level for m in response.context["messages"]], [messages.ERROR])
+        self.assertEqual(BookInstance.objects.get().status, "t")
+        rows["form-0-expected_status"] = "t"
+        self.client.post(changelist, rows)
+        self.assertEqual(BookInstance.objects.get().status, "a")
+        self.assertIsNotNone(Loan.objects.get().date_returned)
+
+class LoanConcurrencyTests(TransactionTestCase):
+    # kelios gijos vienu metu bando išduoti tą patį egzempliorių; laimėti gali tik viena
+    databases = "__all__"
+    threads = 8
+    rounds = 5
+
+    def checkout(self, instance, reader, barrier, results):
+        try:
+            barrier.wait()
+            while True:
+                try:
+                    loans.checkout(BookInstance.objects.get(pk=instance.pk), reader)
+                    results.append(reader.pk)
+                    return
+                except loans.LoanError:
+                    return
+                except OperationalError:
+                    # SQLite: užrakinta duomenų bazė - bandoma dar kartą
+                    continue
+        finally:
+            connection.close()
+
+    def test_no_double_lends(self):
+        readers = [User.objects.create_user(username=f"skaitytojas{i}") for i in range(self.threads)]
+        instance = BookInstance.objects.create(book=Book.objects.create(title="Metai", summary="", isbn="1"))
+        for _ in range(self.rounds):
+            barrier, results = threading.Barrier(self.threads), []
+            workers = [threading.Thread(target=self.checkout, args=(instance, reader, barrier, results))
+                       for reader in readers]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.assertEqual(len(results), 1)
+            self.assertEqual(BookInstance.objects.get().reader_id, results[0])
+            self.assertEqual(Loan.objects.filter(date_returned__isnull=True).get().reader_id, results[0])
+            loans.checkin(instance)
+        self.assertEqual(Loan.objects.count(), self.rounds)
+
+
+class AvailabilityTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create_user(username="skaitytojas")
+        self.book = Book.objects.create(title="Anykščių šilelis", summary="", isbn="1")
+        self.other = Book.objects.create(title="Baltaragio malūnas", summary="", isbn="2")
+        BookInstance.objects.create(book=self.book, status="a")
+        BookInstance.objects.create(book=self.book, status="r", reader=self.reader)
+        for day in (20, 10):
+            BookInstance.objects.create(book=self.other, status="t", reader=self.reader, due_back=date(2030, 1, day))
+
+    def test_annotations(self):
+        book = Book.objects.with_availability().get(pk=self.book.pk)
+        self.assertEqual((book.copies_total, book.copies_available, book.copies_reserved), (2, 1, 1))
+        other = Book.objects.with_availability().get(pk=self.other.pk)
+        self.assertEqual((other.copies_available, other.copies_taken), (0, 2))
+        self.assertEqual(other.next_due_back, date(2030, 1, 10))
+        self.assertEqual(list(Book.objects.available()), [self.book])
+
+    def test_book_list_filter_and_sort(self):
+        response = self.client.get(reverse("books"), {"available": 1})
+        self.assertEqual(list(response.context["books"]), [self.book])
+        self.assertContains(response, "Prieinama 1 iš 2")
+        Book.objects.create(title="Aukso žąsis", summary="", isbn="3")
+        response = self.client.get(reverse("books"), {"sort": "available"})
+        self.assertEqual(response.context["books"][0], self.book)
+        with override_settings(LIBRARY_CURSOR_PAGINATION=True):
+            response = self.client.get(reverse("books"), {"sort": "available"})
+        self.assertEqual([book.isbn for book in response.context["books"]], ["1", "3", "2"])
+
+    def test_detail_and_search(self):
+        self.assertContains(self.client.get(reverse("book", kwargs={"pk": self.other.pk})), "2030")
+        self.assertContains(self.client.get(reverse("search"), {"query": "silel"}), "1 iš 2 prieinama")
+
+    def test_loan_invalidates_book_card(self):
+        self.client.get(reverse("books"))
+        with self.captureOnCommitCallbacks(execute=True):
+            loans.checkout(BookInstance.objects.get(book=self.book, status="a"), self.reader)
+        self.assertContains(self.client.get(reverse("books")), "Prieinama 0 iš 2")
+
+
+class ApiTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = Author.objects.create(first_name="Žemaitė", last_name="")
+        self.book = Book.objects.create(title="Marti", summary="Apsakymas", isbn="1", author=self.author)
+        self.book.genre.add(Genre.objects.create(name="Apsakymas"))
+        BookInstance.objects.create(book=self.book, status="a")
+
+    def get_json(self, url, params=None, **headers):
+        response = self.client.get(url, params, headers=headers)
+        return response, json.loads(b"".join(response.streaming_content))
+
+    def test_books_list_and_detail(self):
+        for i in range(3):
+            Book.objects.create(title=f"Knyga {i}", summary="", isbn=f"k{i}")
+        response, data = self.get_json(reverse("api_books"), {"limit": 2})
+        self.assertEqual([row["title"] for row in data["results"]], ["Knyga 0", "Knyga 1"])
+        response, data = self.get_json(reverse("api_books"), {"limit": 2, "cursor": data["next"]})
+        self.assertEqual([row["title"] for row in data["results"]], ["Knyga 2", "Marti"])
+        self.assertEqual(data["results"][1]["copies_available"], 1)
+        self.assertIsNone(data["next"])
+        response, data = self.get_json(reverse("api_book", kwargs={"pk": self.book.pk}))
+        self.assertEqual(data["genres"][0]["name"], "Apsakymas")
+        self.assertEqual(data["author__first_name"], "Žemaitė")
+        self.assertEqual(self.get_json(reverse("api_genres"))[1]["results"], data["genres"])
+        self.assertEqual(self.client.get(reverse("api_book", kwargs={"pk": 999})).status_code, 404)
+
+    def test_conditional_get(self):
+        url = reverse("api_books")
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            loans.reserve(BookInstance.objects.get(), User.objects.create_user(username="skaitytojas"))
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": response["ETag"]}).status_code, 200)
+
+    def test_gzip(self):
+        response = self.client.get(reverse("api_authors"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        data = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(data["results"][0]["first_name"], "Žemaitė")
+
+
+@override_settings(LIBRARY_PROFILING=True, LIBRARY_PROFILING_MEMORY=True)
+class PerformanceMiddlewareTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        author = Author.objects.create(first_name="Jonas", last_name="Biliūnas")
+        for i in range(3):
+            Book.objects.create(title=f"Knyga {i}", summary="", isbn=str(i), author=author)
+
+    def test_server_timing_and_log(self):
+        with self.assertLogs("library.performance") as logs:
+            response = self.client.get(reverse("books"))
+        self.assertRegex(response["Server-Timing"], r'total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["url_name"], "books")
+        self.assertGreater(entry["sql_count"], 0)
+        self.assertGreater(entry["template_ms"], 0)
+        self.assertGreater(entry["peak_kb"], 0)
+
+    @skipIf(settings.LIBRARY_ASYNC_VIEWS, "async rodinių šablonuose tingios užklausos negalimos")
+    def test_duplicate_queries_are_reported(self):
+        with mock.patch.object(Book.objects, "for_list", lambda: Book.objects.with_availability()):
+            with self.assertLogs("library.performance") as logs:
+                self.client.get(reverse("books"))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["duplicate_queries"], 2)
+        self.assertIn("library_author", entry["worst_duplicate"])
+
+    def test_report(self):
+        path = os.path.join(tempfile.mkdtemp(), "performance.log")
+        with open(path, "w") as file:
+            for ms in range(1, 101):
+                file.write(json.dumps({"url_name": "books", "total_ms": ms}) + "\n")
+            file.write("netinkama eilutė\n")
+        out = io.StringIO()
+        call_command("performance_report", path, stdout=out)
+        self.assertRegex(out.getvalue(), r"books\s+100\s+50.0\s+95.0\s+99.0")
+
+
+class BenchmarkTests(MediaTestMixin, LibraryTestCase):
+    def test_every_scenario_succeeds_on_seeded_catalogue(self):
+        user = benchmark.seed(30)
+        self.assertEqual(Book.objects.count(), 30)
+        self.client.force_login(user)
+        results = benchmark.measure(self.client, benchmark.scenarios(user), requests=1)
+        self.assertEqual({name: row["status"] for name, row in results.items() if row["status"] not in (200, 302)}, {})
+        named = {pattern.name for pattern in library_urls.urlpatterns
+                 if pattern.name not in ("rendition", "instances_action")}
+        self.assertLessEqual(named, set(results))
+
+    def test_compare(self):
+        baseline = {"routes": {"books": {"queries": 4, "p95_ms": 10.0}, "book": {"queries": 5, "p95_ms": 10.0}}}
+        results = {"routes": {"books": {"queries": 4, "p95_ms": 11.0}, "book": {"queries": 6, "p95_ms": 20.0}}}
+        self.assertEqual(benchmark.compare(results, baseline),
+                         ["routes/book: 5 -> 6 queries", "routes/book: p95 10.0 -> 20.0 ms"])
+
+
+class SessionTests(LibraryTestCase):
+    def test_index_does_not_write_session(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("index"))
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse([q for q in queries if "django_session" in q["sql"]])
+        self.assertEqual(response.context["num_visits"], 1)
+        self.assertEqual(self.client.get(reverse("index")).context["num_visits"], 2)
+        self.client.cookies["num_visits"] = "99"
+        self.assertEqual(self.client.get(reverse("index")).context["num_visits"], 1)
+
+    def test_purge_sessions(self):
+        now = timezone.now()
+        Session.objects.bulk_create([Session(session_key=f"raktas{i}", session_data="",
+                                             expire_date=now + timedelta(days=1 if i % 3 == 0 else -1))
+                                     for i in range(30)])
+        call_command("purge_sessions", "--batch-size", "7", stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), 10)
+
+
+class SqliteSettingsTests(LibraryTestCase):
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_load_worker_with_tuned_config(self):
+        path = os.path.join(tempfile.mkdtemp(), "apkrova.sqlite3")
+        with sqlite3.connect(path) as db:
+            db.executescript("""
+                CREATE TABLE auth_user (id INTEGER PRIMARY KEY);
+                CREATE TABLE library_author (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT);
+                CREATE TABLE library_book (id INTEGER PRIMARY KEY, title TEXT, author_id INTEGER);
+                CREATE TABLE library_bookreview (id INTEGER PRIMARY KEY, book_id INTEGER, reviewer_id INTEGER,
+                                                 content TEXT, date_created TEXT);
+                INSERT INTO auth_user VALUES (1);
+                INSERT INTO library_book VALUES (1, 'Metai', NULL);
+            """)
+        reads, writes, errors = sqliteload.worker(path, sqlite_benchmark.tuned_config(), 0.2, 0.5, 1)
+        self.assertGreater(reads, 0)
+        self.assertGreater(writes, 0)
+        self.assertEqual(errors, 0)
+
+
+class ReplicaRoutingTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = routers.ReplicaRouter()
+        self.book = Book.objects.create(title="Metai", summary="", isbn="1")
+
+    @override_settings(LIBRARY_REPLICAS=["replica1", "replica2"])
+    def test_router(self):
+        self.assertEqual(self.router.db_for_read(Book), "default")
+        with routers.reading_from_replica():
+            self.assertIn(self.router.db_for_read(Book), ["replica1", "replica2"])
+            self.assertEqual(self.router.db_for_read(User), "default")
+            self.assertEqual(self.router.db_for_write(Book), "default")
+        self.assertFalse(self.router.allow_migrate("replica1", "library"))
+
+    @override_settings(LIBRARY_REPLICAS=["default"])
+    def test_catalogue_reads_replica_until_post(self):
+        seen = []
+        db_for_read = routers.ReplicaRouter.db_for_read
+        with mock.patch.object(routers.ReplicaRouter, "db_for_read",
+                               lambda router, model, **hints: seen.append(routers.replica_reads.get())
+                               or db_for_read(router, model, **hints)):
+            self.client.get(reverse("authors"))
+            self.assertTrue(seen and all(seen))
+            seen.clear()
+            self.client.get(reverse("mybooks"))
+            self.assertFalse(any(seen))
+            user = User.objects.create_user(username="skaitytojas", password="slaptazodis")
+            self.client.force_login(user)
+            response = self.client.post(reverse("book", kwargs={"pk": self.book.pk}), {"content": "Gera"})
+            self.assertIn(routers.PIN_COOKIE, response.cookies)
+            seen.clear()
+            self.client.get(reverse("authors"))
+            self.assertFalse(any(seen))
+
+
+class LaggingReplicaTests(LibraryTestCase):
+    # tikra atskira replika, kuri dar negavo nė vieno testo įrašo
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings["lagging"] = {**connections.settings["default"],
+                                           "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3")}
+        call_command("migrate", database="lagging", run_syncdb=True, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["lagging"].close()
+        del connections["lagging"]
+        del connections.settings["lagging"]
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        author = Author.objects.create(first_name="Vincas", last_name="Krėvė")
+        self.book = Book.objects.create(title="Skerdžius", summary="Apysaka", isbn="1", author=author)
+        BookInstance.objects.create(book=self.book, status="a")
+
+    @override_settings(LIBRARY_REPLICAS=["lagging"])
+    def test_caches_are_filled_from_primary(self):
+        self.assertEqual(self.client.get(reverse("index")).context["num_books"], 1)
+        self.assertEqual(counters.get_counters()["num_books"], 1)
+        self.assertContains(self.client.get(reverse("books")), "Skerdžius")
+        self.assertContains(self.client.get(reverse("book", kwargs={"pk": self.book.pk})), "Apysaka")
+        self.assertContains(self.client.get(reverse("author", kwargs={"author_id": self.book.author_id})),
+                            "Skerdžius")
+        self.assertIn("Skerdžius", caching.get_fragment("book_card", self.book.pk))
+        response = self.client.get(reverse("api_books"))
+        self.assertIn("Skerdžius".encode(), b"".join(response.streaming_content))
+        self.assertEqual(self.client.get(reverse("api_books"), headers={"if-none-match": response["ETag"]})
+                         .status_code, 304)
+        # atsiliekanti replika lieka tik necachuojamiems puslapiams
+        self.assertNotContains(self.client.get(reverse("authors")), "Krėvė")
+
+    @override_settings(LIBRARY_REPLICAS=["lagging"])
+    def test_fragment_miss_reads_primary(self):
+        with routers.reading_from_replica():
+            self.assertEqual(Book.objects.count(), 0)
+            self.assertEqual(counters.reconcile()["num_books"], 1)
+            html = template.Template('{% load library_tags %}{% cachedfragment "author_books" author.pk %}'
+                                     '{% for book in author.books.all %}{{ book.title }}{% endfor %}'
+                                     '{% endcachedfragment %}').render(template.Context({"author": self.book.author}))
+        self.assertIn("Skerdžius", html)
+
+
+class AsyncViewTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        author = Author.objects.create(first_name="Jonas", last_name="Biliūnas")
+        self.book = Book.objects.create(title="Kliudžiau", summary="Apsakymas", isbn="1", author=author)
+        self.book.genre.add(Genre.objects.create(name="Apsakymas"))
+        BookInstance.objects.create(book=self.book, status="a", uuid="00000000-0000-0000-0000-000000000001")
+        BookReview.objects.create(book=self.book, reviewer=User.objects.create_user(username="recenzentas"),
+                                  content="Graudu")
+        self.factory = AsyncRequestFactory()
+
+    async def get(self, view, path, params=None, **kwargs):
+        request = self.factory.get(path, params)
+        request.auser = AsyncMock(return_value=AnonymousUser())
+        response = await view(request, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    async def test_views_render_without_sync_queries(self):
+        self.assertIn("Kliudžiau", await self.get(async_views.books, "/books/", {"available": 1}))
+        page = await self.get(async_views.book, "/books/1/", pk=self.book.pk)
+        for text in ("Kliudžiau", "Graudu", "00000000-0000-0000-0000-000000000001", "Prieinama 1 iš 1"):
+            self.assertIn(text, page)
+        self.assertIn("Biliūnas", await self.get(async_views.authors, "/authors/"))
+        self.assertIn("Kliudžiau", await self.get(async_views.search, "/search/", {"query": "kliud"}))
+        self.assertIn("1", await self.get(async_views.index, "/"))
+
+    async def test_counters_are_gathered(self):
+        self.assertEqual(await counters.aget_counters(), {"num_books": 1, "num_instances": 1,
+                                                          "num_instances_available": 1, "num_authors": 1})
+
+    @override_settings(LIBRARY_CURSOR_PAGINATION=True)
+    async def test_cursor_pagination(self):
+        await Book.objects.abulk_create([Book(title=f"Knyga {i}", summary="", isbn=f"k{i}") for i in range(3)])
+        self.assertIn("~4", await self.get(async_views.books, "/books/"))
+
+
+class ReviewTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="skaitytojas", password="slaptazodis")
+        self.book = Book.objects.create(title="Anykščių šilelis", summary="", isbn="1")
+        self.url = reverse("book", kwargs={"pk": self.book.pk})
+
+    def review(self, content, book=None):
+        return BookReview.objects.create(book=book or self.book, reviewer=self.user, content=content)
+
+    def test_stats_follow_writes(self):
+        first = self.review("Pirma")
+        second = self.review("Antra")
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.review_count, self.book.latest_review_at), (2, second.date_created))
+        second.delete()
+        other = Book.objects.create(title="Kiti", summary="", isbn="2")
+        first.book = other
+        first.save()
+        self.assertEqual(list(Book.objects.order_by("pk").values_list("review_count", "latest_review_at")),
+                         [(0, None), (1, first.date_created)])
+
+    def test_refresh_after_bulk_create(self):
+        BookReview.objects.bulk_create([BookReview(book=self.book, reviewer=self.user, content=str(i))
+                                        for i in range(3)])
+        self.assertEqual(Book.objects.refresh_review_stats(), 1)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).review_count, 3)
+
+    @override_settings(LIBRARY_REVIEWS_PAGE_SIZE=2)
+    def test_reviews_are_paginated_by_key(self):
+        for i in range(5):
+            self.review(f"Atsiliepimas {i}")
+        page = self.client.get(self.url)
+        self.assertContains(page, "Atsiliepimas 4")
+        self.assertContains(page, "Atsiliepimas 3")
+        self.assertNotContains(page, "Atsiliepimas 2")
+        url = page.context["reviews"].next_token
+        contents = []
+        while url:
+            response = self.client.get(reverse("book_reviews", kwargs={"pk": self.book.pk}), {"cursor": url})
+            contents += [review.content for review in response.context["reviews"]]
+            url = response.context["reviews"].next_token
+        self.assertEqual(contents, ["Atsiliepimas 2", "Atsiliepimas 1", "Atsiliepimas 0"])
+        self.assertNotContains(response, "Daugiau komentarų")
+
+    def test_post_fetches_book_once(self):
+        self.client.force_login(self.user)
+        with mock.patch("library.views.BookDetailView.get_object", autospec=True,
+                        side_effect=lambda view: Book.objects.for_detail().get(pk=self.book.pk)) as get_object:
+            response = self.client.post(self.url, {"content": "Nauja"})
+        self.assertRedirects(response, self.url)
+        self.assertEqual(get_object.call_count, 1)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).review_count, 1)
+
+
+class RecommendationTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        first, second = Genre.objects.create(name="Poezija"), Genre.objects.create(name="Drama")
+        self.books = [Book.objects.create(title=f"Knyga {i}", summary="", isbn=str(i)) for i in range(5)]
+        for book, genres in zip(self.books, [[first], [first], [first, second], [second], []]):
+            book.genre.set(genres)
+        self.readers = [User.objects.create_user(username=f"skaitytojas{i}") for i in range(3)]
+        for reader, books in zip(self.readers, [(0, 3), (0, 3), (0, 1)]):
+            for i in books:
+                self.borrow(reader, self.books[i], timezone.now() - timedelta(days=30))
+
+    def borrow(self, reader, book, date_out):
+        Loan.objects.create(instance=BookInstance.objects.create(book=book), reader=reader, date_out=date_out)
+
+    def test_scores_combine_borrowing_and_genres(self):
+        engine = recommendations.Engine(top=3).load()
+        self.assertEqual([pk for score, pk in engine.recommend(self.books[0].pk)],
+                         [self.books[1].pk, self.books[3].pk, self.books[2].pk])
+        self.assertEqual(engine.recommend(self.books[4].pk), [])
+
+    def test_command_stores_top_k_and_detail_page_shows_them(self):
+        out = io.StringIO()
+        call_command("build_recommendations", "--top", "2", stdout=out)
+        self.assertIn("Rekomendacijos perskaičiuotos 5 knygų", out.getvalue())
+        self.assertEqual(list(BookRecommendation.objects.filter(book=self.books[0]).values_list("related", "rank")),
+                         [(self.books[1].pk, 1), (self.books[3].pk, 2)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("book", kwargs={"pk": self.books[0].pk}))
+        self.assertContains(response, "Skaitytojai taip pat skaitė")
+        self.assertContains(response, reverse("book", kwargs={"pk": self.books[3].pk}))
+        self.assertEqual(len([q for q in queries if "library_bookrecommendation" in q["sql"]]), 1)
+
+    def test_incremental_build_touches_only_affected_books(self):
+        call_command("build_recommendations", stdout=io.StringIO())
+        self.borrow(self.readers[2], self.books[2], timezone.now())
+        engine = recommendations.Engine().load()
+        # naujai paimta knyga, kitos to skaitytojo knygos ir knyga be rekomendacijų
+        self.assertEqual(engine.affected_books(date.today()),
+                         sorted(book.pk for book in (self.books[0], self.books[1], self.books[2], self.books[4])))
+
+
+class HoldTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.readers = [User.objects.create_user(username=f"skaitytojas{i}", password="slaptazodis")
+                        for i in range(4)]
+        self.book = Book.objects.create(title="Altorių šešėly", summary="", isbn="1")
+        self.instance = loans.checkout(BookInstance.objects.create(book=self.book), self.readers[0])
+
+    def positions(self):
+        return [(hold.reader.username, hold.status, hold.position)
+                for reader in self.readers for hold in Hold.objects.for_reader(reader)]
+
+    def test_returned_copy_goes_to_first_in_queue(self):
+        holds = [loans.place_hold(self.book, reader) for reader in self.readers[1:]]
+        self.assertEqual(loans.place_hold(self.book, self.readers[1]), holds[0])
+        self.assertEqual(self.positions(), [("skaitytojas1", "w", 1), ("skaitytojas2", "w", 2),
+                                            ("skaitytojas3", "w", 3)])
+        loans.checkin(self.instance)
+        self.instance.refresh_from_db()
+        self.assertEqual((self.instance.status, self.instance.reader), ('r', self.readers[1]))
+        self.assertEqual(self.positions()[:2], [("skaitytojas1", "r", None), ("skaitytojas2", "w", 1)])
+        loans.checkout(self.instance, self.readers[1])
+        self.assertEqual(Hold.objects.get(pk=holds[0].pk).status, 'c')
+        self.assertEqual(Loan.objects.filter(date_returned__isnull=True).get().reader, self.readers[1])
+
+    def test_hold_on_available_copy_is_ready_at_once(self):
+        loans.checkin(self.instance)
+        hold = loans.place_hold(self.book, self.readers[1])
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.instance), ('r', self.instance))
+
+    def test_expired_holds_are_swept(self):
+        first, second = (loans.place_hold(self.book, reader) for reader in self.readers[1:3])
+        loans.checkin(self.instance)
+        Hold.objects.filter(pk=first.pk).update(expires_at=timezone.now() - timedelta(hours=1))
+        out = io.StringIO()
+        call_command("expire_holds", stdout=out)
+        self.assertIn("Pasibaigė 1", out.getvalue())
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.reader, self.readers[2])
+        Hold.objects.filter(pk=second.pk).update(expires_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(loans.expire_holds(), (1, 0))
+        self.instance.refresh_from_db()
+        self.assertEqual((self.instance.status, self.instance.reader), ('a', None))
+
+    def test_views(self):
+        self.client.force_login(self.readers[1])
+        self.assertRedirects(self.client.post(reverse("place_hold", kwargs={"pk": self.book.pk})),
+                             reverse("mybooks"))
+        self.assertContains(self.client.get(reverse("mybooks")), "Vieta eilėje: 1")
+        hold = Hold.objects.get()
+        self.client.post(reverse("cancel_hold", kwargs={"pk": hold.pk}))
+        self.assertEqual(Hold.objects.get().status, 'x')
+
+
+class HoldConcurrencyTests(TransactionTestCase):
+    # tūkstančiai skaitytojų vienu metu stoja į eilę, o egzemplioriai grąžinami lygiagrečiai
+    databases = "__all__"
+    threads = 8
+    readers = 2000
+    copies = 20
+
+    def retry(self, operation, *args):
+        while True:
+            try:
+                return operation(*args)
+            except OperationalError:
+                # SQLite: užrakinta duomenų bazė - bandoma dar kartą
+                continue
+
+    def run_threads(self, work, items):
+        barrier = threading.Barrier(self.threads)
+
+        def run(chunk):
+            try:
+                barrier.wait()
+                for item in chunk:
+                    work(item)
+            finally:
+                connection.close()
+        workers = [threading.Thread(target=run, args=(items[i::self.threads],)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_fifo_under_concurrent_holds_and_returns(self):
+        User.objects.bulk_create([User(username=f"skaitytojas{i}") for i in range(self.readers)])
+        readers = list(User.objects.order_by("pk"))
+        book = Book.objects.create(title="Metai", summary="", isbn="1")
+        instances = [loans.checkout(BookInstance.objects.create(book=book), readers[0])
+                     for _ in range(self.copies)]
+        self.run_threads(lambda reader: self.retry(loans.place_hold, book, reader), readers[1:])
+        queue = list(Hold.objects.waiting(book).values_list("reader_id", flat=True))
+        self.assertEqual(len(queue), self.readers - 1)
+
+        for start in range(0, 3 * self.copies, self.copies):
+            self.run_threads(lambda instance: self.retry(loans.checkin, instance), instances)
+            ready = dict(Hold.objects.filter(status='r').values_list("instance_id", "reader_id"))
+            self.assertEqual(sorted(ready.values()), sorted(queue[start:start + self.copies]))
+            self.assertEqual(dict(BookInstance.objects.values_list("pk", "reader_id")), ready)
+            for instance in instances:
+                instance.refresh_from_db()
+                loans.checkout(instance, instance.reader)
+        self.assertEqual(Hold.objects.filter(status='c').count(), 3 * self.copies)
+        self.assertEqual(Hold.objects.waiting(book).count(), self.readers - 1 - 3 * self.copies)
+
+
+class ProductionSettingsTests(LibraryTestCase):
+    # po pirmų užklausų nei šablonai, nei statiniai failai iš disko nebeskaitomi
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with mock.patch.dict(os.environ, DJANGO_SECRET_KEY="produkcijos-raktas"):
+            cls.production = importlib.import_module("mysite.settings_production")
+        static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(static_root.cleanup)
+        cls.static_root = os.path.realpath(static_root.name)
+        production = override_settings(DEBUG=False, TEMPLATES=cls.production.TEMPLATES,
+                                       STORAGES=cls.production.STORAGES, STATIC_ROOT=cls.static_root)
+        production.enable()
+        cls.addClassCleanup(production.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def setUp(self):
+        super().setUp()
+        views.STATIC_CACHE.clear()
+        author = Author.objects.create(first_name="Jonas", last_name="Biliūnas")
+        self.book = Book.objects.create(title="Liūdna pasaka", summary="", isbn="1", author=author)
+
+    def urls(self):
+        from django.templatetags.static import static
+        return [reverse("index"), reverse("books"), reverse("book", kwargs={"pk": self.book.pk}),
+                reverse("authors"), reverse("search") + "?query=pasaka",
+                static("css/styles.css"), static("tinymce/tinymce.min.js"), static("tinymce/plugins/link/plugin.min.js")]
+
+    def test_secret_key_is_required(self):
+        self.assertEqual(self.production.SECRET_KEY, "produkcijos-raktas")
+        with mock.patch.dict(os.environ, clear=True), self.assertRaises(ImproperlyConfigured):
+            importlib.reload(self.production)
+        with mock.patch.dict(os.environ, DJANGO_SECRET_KEY="produkcijos-raktas"):
+            importlib.reload(self.production)
+
+    def test_cache_is_shared_between_workers(self):
+        self.assertNotIn(self.production.CACHES["default"]["BACKEND"],
+                         ("django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache"))
+
+    def test_hashed_assets_are_immutable_and_precompressed(self):
+        url = self.urls()[6]
+        self.assertRegex(url, r"tinymce\.min\.[0-9a-f]{12}\.js$")
+        response = self.client.get(url, headers={"accept-encoding": "gzip, deflate"})
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        with open(os.path.join(self.static_root, "tinymce", "tinymce.min.js"), "rb") as file:
+            self.assertEqual(gzip.decompress(response.content), file.read())
+        self.assertEqual(self.client.get("/static/tinymce/tinymce.min.js")["Cache-Control"],
+                         f"public, max-age={settings.LIBRARY_STATIC_MAX_AGE}")
+        self.assertEqual(self.client.get("/static/css/nera.css").status_code, 404)
+
+    def test_no_disk_reads_after_warm_up(self):
+        for url in self.urls():
+            self.assertEqual(self.client.get(url, headers={"accept-encoding": "gzip"}).status_code, 200)
+        opened = []
+        real_open = open
+
+        def spy(file, *args, **kwargs):
+            opened.append(str(file))
+            return real_open(file, *args, **kwargs)
+        with mock.patch("builtins.open", spy):
+            for url in self.urls():
+                self.assertEqual(self.client.get(url, headers={"accept-encoding": "gzip"}).status_code, 200)
+        self.assertEqual([path for path in opened if path.endswith(".html") or path.startswith(self.static_root)], [])
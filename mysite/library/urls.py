@@ -1,14 +1,31 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import path, re_path
+from . import api, async_views, views
 
-urlpatterns = [
-    path("", views.index, name="index"),
-    path("authors/", views.authors, name="authors"),
+if settings.LIBRARY_ASYNC_VIEWS:
+    # ASGI serveriui: katalogo rodiniai be sync_to_async gijų
+    catalogue = [
+        path("", async_views.index, name="index"),
+        path("authors/", async_views.authors, name="authors"),
+        path("books/", async_views.books, name="books"),
+        path("books/<int:pk>/", async_views.book, name="book"),
+        path("search/", async_views.search, name="search"),
+    ]
+else:
+    catalogue = [
+        path("", views.index, name="index"),
+        path("authors/", views.authors, name="authors"),
+        path("books/", views.BookListView.as_view(), name="books"),
+        path("books/<int:pk>/", views.BookDetailView.as_view(), name="book"),
+        path("search/", views.search, name="search"),
+    ]
+
+urlpatterns = catalogue + [
     path("authors/<int:author_id>/", views.author, name="author"),
-    path("books/", views.BookListView.as_view(), name="books"),
-    path("books/<int:pk>/", views.BookDetailView.as_view(), name="book"),
-    path("search/", views.search, name="search"),
+    path("books/<int:pk>/reviews/", views.book_reviews, name="book_reviews"),
+    path("books/<int:pk>/hold/", views.place_hold, name="place_hold"),
     path("mybooks/", views.MyBookInstanceListView.as_view(), name="mybooks"),
+    path("holds/<int:pk>/cancel/", views.cancel_hold, name="cancel_hold"),
     path("signup/", views.SignUp.as_view(), name="signup"),
     # path("profile/", views.ProfileUpdateView.as_view(), name="profile"),
     path("profile/", views.profile, name="profile"),
@@ -17,4 +34,12 @@ urlpatterns = [
     path('instances/new/', views.BookInstanceCreateView.as_view(), name="instances_new"),
     path('instances/<int:pk>/update', views.BookInstanceUpdateView.as_view(), name="instances_update"),
     path('instances/<int:pk>/delete', views.BookInstanceDeleteView.as_view(), name="instances_delete"),
+    path('instances/<int:pk>/<str:action>', views.instance_action, name="instances_action"),
+    path("api/books/", api.books, name="api_books"),
+    path("api/books/<int:pk>/", api.book, name="api_book"),
+    path("api/authors/", api.authors, name="api_authors"),
+    path("api/authors/<int:pk>/", api.author, name="api_author"),
+    path("api/genres/", api.genres, name="api_genres"),
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}renditions/(?P<content_hash>[0-9a-f]{{64}})/"
+            r"(?P<width>\d+)(?P<square>-square)?\.(?P<fmt>webp|jpg)$", views.rendition, name="rendition"),
 ]
@@ -0,0 +1,24 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+# Lentelių pakeitimų versijos (laiko žymės) kešе. Iš jų API skaičiuoja ETag ir
+# Last-Modified neliesdamas duomenų bazės. Dingus raktui versija tampa "dabar",
+# todėl klientas tiesiog gauna naują atsakymą vietoj pasenusio 304.
+
+PREFIX = "library:version:"
+TABLES = ("book", "author", "genre", "instance")
+
+
+def get_versions(*tables):
+    keys = [PREFIX + table for table in tables]
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return [{**found, **missing}[key] for key in keys]
+
+
+def touch(*tables):
+    keys = [PREFIX + table for table in tables]
+    transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time()), timeout=None))
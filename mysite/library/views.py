@@ -1,40 +1,64 @@
+import csv
+import json
+import mimetypes
+import os
+from itertools import chain
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.shortcuts import render, reverse, redirect
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.staticfiles.views import serve as staticfiles_serve
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.contrib.auth.decorators import user_passes_test
+from django.views.decorators.http import require_POST
+from django.shortcuts import get_object_or_404, render, reverse, redirect
 from django.urls import reverse_lazy
+from django.utils.cache import patch_vary_headers
+from django.utils._os import safe_join
+from django.utils.functional import SimpleLazyObject
 from django.views.generic.edit import FormMixin
-from .models import Book, BookInstance, Author
+from .models import Book, BookInstance, BookRecommendation, BookReview, Author, Hold, Profile
 from django.views import generic
 from django.core.paginator import Paginator
-from django.db.models import Q
+from . import counters, images, loans, search as search_index, storage
+from .pagination import CursorPaginationMixin, CursorPaginator, paginate
 from .forms import (BookReviewForm,
                     UserChangeForm,
                     ProfileChangeForm,
-                    InstanceUpdateForm)
+                    InstanceUpdateForm,
+                    InstanceFilterForm)
+
+VISITS_SALT = "library.visits"
+
+
+def visits(request):
+    # apsilankymų skaitliukas laikomas pasirašytame slapuke, kad sesija (ir duomenų bazė) nebūtų rašoma
+    try:
+        return int(request.get_signed_cookie("num_visits", default=1, salt=VISITS_SALT))
+    except ValueError:
+        return 1
+
+
+def set_visits(response, num_visits):
+    response.set_signed_cookie("num_visits", num_visits + 1, salt=VISITS_SALT,
+                               max_age=365 * 24 * 60 * 60, httponly=True, samesite="Lax")
+
 
 def index(request):
-    num_books = Book.objects.count()
-    num_instances = BookInstance.objects.count()
-    num_instances_available = BookInstance.objects.filter(status='a').count()
-    num_authors = Author.objects.count()
-    num_visits = request.session.get("num_visits", 1)
-    request.session['num_visits'] = num_visits + 1
+    num_visits = visits(request)
     my_context = {
-        "num_books": num_books,
-        "num_instances": num_instances,
-        'num_instances_available': num_instances_available,
-        "num_authors": num_authors,
+        **counters.get_counters(),
         'num_visits': num_visits,
     }
-    return render(request, template_name="index.html", context=my_context)
+    response = render(request, template_name="index.html", context=my_context)
+    set_visits(response, num_visits)
+    return response
 
 
 def authors(request):
-    authors = Author.objects.all()
-    paginator = Paginator(authors, per_page=3)
-    page_number = request.GET.get('page')
-    paged_authors = paginator.get_page(page_number)
+    paged_authors = paginate(request, Author.objects.all(), per_page=3)
     context = {
         "authors": paged_authors,
     }
@@ -42,17 +66,30 @@ def authors(request):
 
 
 def author(request, author_id):
+    # autoriaus knygos užklausiamos tik šablone, kai "author_books" fragmento nėra keše
     context = {
-        "author": Author.objects.get(pk=author_id)
+        "author": get_object_or_404(Author, pk=author_id)
     }
     return render(request, template_name="author.html", context=context)
 
 
-class BookListView(generic.ListView):
+class BookListView(CursorPaginationMixin, generic.ListView):
     model = Book
     template_name = "books.html"
     context_object_name = "books"
     paginate_by = 3
+    ordering = ("title", "pk")
+
+    def get_ordering(self):
+        if self.request.GET.get("sort") == "available":
+            return ("-copies_available", "title", "pk")
+        return self.ordering
+
+    def get_queryset(self):
+        books = Book.objects.for_list()
+        if self.request.GET.get("available"):
+            books = books.available()
+        return books.order_by(*self.get_ordering())
 
 
 class BookDetailView(FormMixin, generic.DetailView):
@@ -62,9 +99,19 @@ class BookDetailView(FormMixin, generic.DetailView):
     form_class = BookReviewForm
     # success_url = reverse_lazy('books')
 
+    def get_queryset(self):
+        return Book.objects.for_detail()
+
     def get_success_url(self):
         return reverse("book", kwargs={"pk": self.object.pk})
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # pirmas atsiliepimų puslapis užklausiamas tik tada, kai "book_reviews" fragmento nėra keše
+        context["reviews"] = SimpleLazyObject(lambda: review_page(self.object.pk))
+        context["recommendations"] = BookRecommendation.objects.for_book(self.object.pk)
+        return context
+
     # standartinis post metodo perrašymas, naudojant FormMixin, galite kopijuoti tiesiai į savo projektą.
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -76,21 +123,30 @@ class BookDetailView(FormMixin, generic.DetailView):
 
     def form_valid(self, form):
         form.instance.reviewer = self.request.user
-        form.instance.book = self.get_object()
+        form.instance.book = self.object
         form.save()
         return super().form_valid(form)
 
 
-def search(request):
-    query = request.GET.get('query')
-    books = Book.objects.filter(Q(title__icontains=query) |
-                                Q(summary__icontains=query) |
-                                Q(author__first_name__icontains=query) |
-                                Q(author__last_name__icontains=query))
+def review_page(book_id, cursor=None):
+    reviews = BookReview.objects.for_book(book_id)
+    return CursorPaginator(reviews, settings.LIBRARY_REVIEWS_PAGE_SIZE, ("-pk",)).page(cursor)
+
+
+def book_reviews(request, pk):
+    # kiti atsiliepimų puslapiai: HTML fragmentas, kurį book.html įkelia paspaudus "Daugiau komentarų"
+    book = get_object_or_404(Book.objects.only("pk"), pk=pk)
+    context = {"book": book, "reviews": review_page(book.pk, request.GET.get("cursor"))}
+    return render(request, template_name="reviews.html", context=context)
 
-    authors = Author.objects.filter(Q(first_name__icontains=query) |
-                                    Q(last_name__icontains=query))
 
+def search(request):
+    # knygos ir autoriai puslapiuojami atskirai, kad ilgesnis sąrašas nekartotų trumpesniojo paskutinio puslapio
+    query = request.GET.get('query', '')
+    books = Paginator(search_index.search_books(Book.objects.with_availability(), query),
+                      per_page=10).get_page(request.GET.get('books_page'))
+    authors = Paginator(search_index.search_authors(Author.objects.all(), query),
+                        per_page=10).get_page(request.GET.get('authors_page'))
     context = {
         "query": query,
         "books": books,
@@ -105,7 +161,26 @@ class MyBookInstanceListView(LoginRequiredMixin, generic.ListView):
     context_object_name = "instances"
 
     def get_queryset(self):
-        return BookInstance.objects.filter(reader=self.request.user)
+        return BookInstance.objects.for_reader(self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["holds"] = Hold.objects.for_reader(self.request.user)
+        return context
+
+
+@login_required
+@require_POST
+def place_hold(request, pk):
+    loans.place_hold(get_object_or_404(Book.objects.only("pk"), pk=pk), request.user)
+    return redirect("mybooks")
+
+
+@login_required
+@require_POST
+def cancel_hold(request, pk):
+    loans.release(get_object_or_404(Hold, pk=pk, reader=request.user))
+    return redirect("mybooks")
 
 
 class SignUp(generic.CreateView):
@@ -138,14 +213,53 @@ def profile(request):
     return render(request, template_name="profile.html", context=context)
 
 
-class BookInstanceListView(LoginRequiredMixin, UserPassesTestMixin, generic.ListView):
+class BookInstanceListView(LoginRequiredMixin, UserPassesTestMixin, CursorPaginationMixin, generic.ListView):
     model = BookInstance
     context_object_name = "instances"
     template_name = "instances.html"
+    paginate_by = 50
+    ordering = ("pk",)
+    export_fields = ("uuid", "book__title", "status", "due_back", "reader__username")
 
     def test_func(self):
         return self.request.user.is_staff
 
+    def get_queryset(self):
+        self.filter_form = InstanceFilterForm(self.request.GET or None)
+        queryset = BookInstance.objects.select_related("book", "reader").order_by(*self.ordering)
+        return self.filter_form.filter(queryset)
+
+    def get(self, request, *args, **kwargs):
+        export = request.GET.get("export")
+        if export in ("csv", "jsonl"):
+            return self.export(export)
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["filter_form"] = self.filter_form
+        return context
+
+    def export(self, export):
+        # eilutės skaitomos dalimis, todėl atminties poreikis nepriklauso nuo egzempliorių skaičiaus
+        rows = self.get_queryset().values_list(*self.export_fields).iterator(chunk_size=2000)
+        if export == "csv":
+            writer = csv.writer(Echo())
+            lines = chain([writer.writerow(self.export_fields)], (writer.writerow(row) for row in rows))
+            content_type = "text/csv"
+        else:
+            lines = (json.dumps(dict(zip(self.export_fields, row)), cls=DjangoJSONEncoder) + "\n" for row in rows)
+            content_type = "application/jsonl"
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="instances.{export}"'
+        return response
+
+
+class Echo:
+    # csv.writer rašo į "failą", kuris tiesiog grąžina eilutę (Django dokumentacijos pavyzdys)
+    def write(self, value):
+        return value
+
 
 class BookInstanceDetailView(LoginRequiredMixin, UserPassesTestMixin, generic.DetailView):
     model = BookInstance
@@ -179,6 +293,38 @@ class BookInstanceUpdateView(LoginRequiredMixin, UserPassesTestMixin, generic.Up
     def test_func(self):
         return self.request.user.is_staff
 
+    def form_valid(self, form):
+        # vietoj save() - sąlyginis UPDATE, kad du bibliotekininkai neišduotų to paties egzemplioriaus
+        data = form.cleaned_data
+        try:
+            loans.update(self.object, data["expected_status"] or form.initial["status"],
+                         old_book_id=form.initial["book"],
+                         **{field: data[field] for field in form._meta.fields})
+        except loans.LoanError as error:
+            form.add_error(None, error)
+            return self.form_invalid(form)
+        return redirect(self.get_success_url())
+
+
+@require_POST
+@login_required
+@user_passes_test(lambda user: user.is_staff)
+def instance_action(request, pk, action):
+    if action not in ("checkout", "checkin", "renew"):
+        raise Http404
+    instance = get_object_or_404(BookInstance, pk=pk)
+    try:
+        if action == "checkout":
+            # rezervuotą egzempliorių atsiima tas, kam jis paruoštas
+            loans.checkout(instance, instance.reader)
+        elif action == "checkin":
+            loans.checkin(instance)
+        else:
+            loans.renew(instance, instance.reader)
+    except loans.LoanError as error:
+        return render(request, "instance.html", {"instance": instance, "error": error}, status=409)
+    return redirect("instance", pk=pk)
+
 
 class BookInstanceDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic.DeleteView):
     model = BookInstance
@@ -188,3 +334,64 @@ class BookInstanceDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic.De
 
     def test_func(self):
         return self.request.user.is_staff
+
+
+def rendition(request, content_hash, width, fmt, square=None):
+    # Paveikslėlio versija generuojama pirmą kartą jos paprašius. Toliau failą
+    # tiesiai iš MEDIA_ROOT gali atiduoti web serveris (pvz., nginx try_files).
+    width, square = int(width), bool(square)
+    path = os.path.join(settings.MEDIA_ROOT, images.rendition_name(content_hash, width, square, fmt))
+    if not os.path.exists(path):
+        for model in (Book, Profile):
+            source = model.find_rendition_source(content_hash, width, square)
+            if source:
+                images.render(source.path, path, width, square, fmt)
+                break
+        else:
+            raise Http404
+    content_type = "image/jpeg" if fmt == "jpg" else f"image/{fmt}"
+    response = FileResponse(open(path, "rb"), content_type=content_type)
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+# collectstatic rezultatas atmintyje: {kelias: (turinys, {kodavimas: suspaustas turinys}, tipas, ar su hash'u)}.
+# Failas iš disko skaitomas tik per pirmą jo užklausą.
+STATIC_CACHE = {}
+
+
+def load_static(path):
+    if path not in STATIC_CACHE:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+        if not os.path.isfile(full_path):
+            raise Http404
+        with open(full_path, "rb") as file:
+            content = file.read()
+        variants = {}
+        for encoding, suffix in storage.ENCODINGS.items():
+            if os.path.isfile(full_path + suffix):
+                with open(full_path + suffix, "rb") as file:
+                    variants[encoding] = file.read()
+        hashed = path in set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        STATIC_CACHE[path] = (content, variants, content_type, hashed)
+    return STATIC_CACHE[path]
+
+
+def static_file(request, path):
+    # Produkcijoje (settings_production) statiniai failai atiduodami iš STATIC_ROOT su iš anksto
+    # suspaustais variantais. Vardai su turinio hash'u nesikeičia, todėl naršyklė juos kešuoja metams.
+    if settings.DEBUG:
+        return staticfiles_serve(request, path)
+    content, variants, content_type, hashed = load_static(path)
+    accepted = request.headers.get("Accept-Encoding", "")
+    encoding = next((encoding for encoding in variants if encoding in accepted), None)
+    response = HttpResponse(variants.get(encoding, content), content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    if hashed:
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = f"public, max-age={settings.LIBRARY_STATIC_MAX_AGE}"
+    return response
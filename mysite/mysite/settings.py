@@ -46,6 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # įjungiama LIBRARY_PROFILING = True, kitaip Django jo neįtraukia
+    'library.middleware.PerformanceMiddleware',
+    # įjungiama, kai LIBRARY_REPLICAS netuščias
+    'library.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,13 +83,118 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite nustatymai keliems procesams (gunicorn workeriams): WAL leidžia skaityti rašant,
+# IMMEDIATE transakcijos rašymo užraktą ima iš karto (be "database is locked" kėlimo metu),
+# o busy_timeout palaukia, kol užraktas atsilaisvins. Palyginimas: sqlite_benchmark komanda.
+SQLITE_INIT_COMMAND = ";".join([
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+])
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Skaitymo replikos (library/routers.py). Vietoje replikas atstoja SQLite failų kopijos:
+# LIBRARY_SQLITE_REPLICAS=2 ir periodiškai paleidžiama sync_replicas komanda.
+# Testuose replikos yra pagrindinės bazės veidrodžiai (TEST MIRROR).
+LIBRARY_REPLICAS = []
+for i in range(1, int(os.environ.get("LIBRARY_SQLITE_REPLICAS", 0)) + 1):
+    DATABASES[f"replica{i}"] = {
+        **DATABASES["default"],
+        'NAME': BASE_DIR / f'db.replica{i}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    LIBRARY_REPLICAS.append(f"replica{i}")
+
+DATABASE_ROUTERS = ['library.routers.ReplicaRouter']
+
+# tik skaitantys puslapiai, kurių užklausos gali eiti į replikas. Puslapiai, kurie pildo kešą
+# (fragmentai, skaitliukai) arba atsako su ETag pagal lentelių versijas, skaito pagrindinę bazę:
+# iš atsiliekančios replikos pasenę duomenys liktų keše arba po nauju ETag.
+LIBRARY_REPLICA_VIEWS = ["book_reviews", "search", "authors"]
+# kiek sekundžių po POST skaitoma iš pagrindinės bazės
+LIBRARY_REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Fragmentų invalidavimas, lentelių versijos ir sesijos tikisi vieno kešo visiems
+# procesams. LocMemCache tinka tik vienam procesui (runserver, testai); keliems gunicorn
+# workeriams nustatyti LIBRARY_CACHE_URL=redis://127.0.0.1:6379 (reikia redis paketo)
+# arba LIBRARY_CACHE_URL=db (DatabaseCache, lentelę sukuria manage.py createcachetable).
+LIBRARY_CACHE_URL = os.environ.get("LIBRARY_CACHE_URL", "")
+
+if LIBRARY_CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': LIBRARY_CACHE_URL,
+        }
+    }
+elif LIBRARY_CACHE_URL == "db":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'library_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+LIBRARY_FRAGMENT_TIMEOUT = 60 * 60
+# fragmentų kešo pataikymų statistika (fragment_cache_stats); pagal nutylėjimą nerenkama
+LIBRARY_FRAGMENT_STATS = os.environ.get("LIBRARY_FRAGMENT_STATS") == "1"
+
+# sesijos skaitomos iš kešo; į duomenų bazę rašoma tik pasikeitus sesijai (pvz., prisijungus).
+# Pasibaigusias sesijas periodiškai išvalo purge_sessions komanda.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# užklausų našumo matavimas (library/middleware.py); atminties sekimas tracemalloc gerokai lėtina
+LIBRARY_PROFILING = os.environ.get("LIBRARY_PROFILING") == "1"
+LIBRARY_PROFILING_MEMORY = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'performance': {
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'performance.log',
+            'formatter': 'line',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'library.performance': {
+            'handlers': ['performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +239,10 @@ USE_TZ = False
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# collectstatic rezultatas; produkcijoje jį atiduoda library.views.static_file (mysite/settings_production.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# statinių failų be hash'o varde (pvz., TinyMCE įskiepių) kešavimo trukmė sekundėmis
+LIBRARY_STATIC_MAX_AGE = 60 * 60
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -143,6 +256,33 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'library/media')
 
 MEDIA_URL = '/media/'
 
+# paveikslėlių versijų generavimas fone (library/tasks.py)
+LIBRARY_TASK_WORKERS = 2
+LIBRARY_TASKS_EAGER = False
+
+# puslapiavimas pagal raktą (library/pagination.py) vietoj COUNT(*) ir OFFSET
+LIBRARY_CURSOR_PAGINATION = False
+LIBRARY_CURSOR_APPROXIMATE_COUNT = True
+LIBRARY_APPROXIMATE_COUNT_TIMEOUT = 300
+
+# atsiliepimų puslapio dydis knygos puslapyje ir books/<pk>/reviews/ fragmente
+LIBRARY_REVIEWS_PAGE_SIZE = 10
+
+# kiek panašių knygų saugoma ir rodoma knygos puslapyje (library/recommendations.py)
+LIBRARY_RECOMMENDATIONS = 5
+
+# JSON API (library/api.py) puslapio dydis; ?limit= leidžia iki 500
+LIBRARY_API_PAGE_SIZE = 50
+
+# async katalogo rodiniai (library/async_views.py) ASGI serveriui, pvz., uvicorn mysite.asgi:application
+LIBRARY_ASYNC_VIEWS = os.environ.get("LIBRARY_ASYNC_VIEWS") == "1"
+
+# numatytasis išdavimo terminas dienomis (library/loans.py)
+LIBRARY_LOAN_DAYS = 14
+# kiek dienų laukiama eilėje ir kiek dienų paruoštas egzempliorius laikomas atsiimti
+LIBRARY_HOLD_DAYS = 30
+LIBRARY_HOLD_PICKUP_DAYS = 3
+
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 
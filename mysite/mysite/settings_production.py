@@ -0,0 +1,57 @@
+"""
+Produkcijos nustatymai: DJANGO_SETTINGS_MODULE=mysite.settings_production
+
+Aplinkos kintamieji: DJANGO_SECRET_KEY (privalomas), DJANGO_ALLOWED_HOSTS, LIBRARY_CACHE_URL
+
+Prieš paleidžiant: python manage.py collectstatic --noinput
+                  python manage.py createcachetable  (jei nenustatytas LIBRARY_CACHE_URL=redis://...)
+"""
+
+import os
+from django.core.exceptions import ImproperlyConfigured
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+# settings.py raktas yra viešas repozitorijoje: juo pasirašytas sesijas, slapukus ir kursorius suklastotų bet kas
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY")
+if not SECRET_KEY:
+    raise ImproperlyConfigured("Produkcijoje būtina nustatyti DJANGO_SECRET_KEY")
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "localhost").split(",")
+
+# fragmentų invalidavimas, API versijos ir sesijos turi būti bendri visiems workeriams,
+# todėl vietoj LocMemCache numatytasis - DatabaseCache (Redis: LIBRARY_CACHE_URL=redis://...)
+if not LIBRARY_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'library_cache',
+        }
+    }
+
+# šablonai kompiliuojami vieną kartą procese ir daugiau iš disko neskaitomi
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'OPTIONS': {
+            'context_processors': TEMPLATES[0]['OPTIONS']['context_processors'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# failų vardai su turinio hash'u ir iš anksto suspausti .gz/.br variantai (library/storage.py)
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "library.storage.CompressedManifestStaticFilesStorage",
+    },
+}
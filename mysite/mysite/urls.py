@@ -15,9 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from library.views import static_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,5 +26,5 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
     path('tinymce/', include('tinymce.urls')),
     path('i18n/', include('django.conf.urls.i18n')),
-] + (static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) +
-    static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
+    re_path(rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.+)$", static_file),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)